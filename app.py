@@ -5,12 +5,32 @@ import json
 from datetime import datetime, timedelta
 import os
 
+from catalog import catalog, add_catalog_routes, publish_product_changes, record_changes, products_response
+from database import get_db, init_app, upgrade_schema, day_range
+from events import add_event_routes
+from metrics import add_metrics_routes
+from product_import import add_import_routes
+from product_search import add_search_routes
+from reports import build_daily_report
+from sales_export import add_export_routes
+from sales import add_sales_routes, insert_sale, query_sales, sales_query_args
+from slow_queries import add_slow_query_routes
+
 app = Flask(__name__)
 CORS(app)
+add_metrics_routes(app)
+add_slow_query_routes(app)
+init_app(app)
+add_catalog_routes(app)
+add_import_routes(app)
+add_search_routes(app)
+add_export_routes(app)
+add_event_routes(app)
+add_sales_routes(app)
 
 # Database initialization
 def init_db():
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Products table
@@ -69,8 +89,11 @@ def init_db():
             sample_products
         )
     
+    upgrade_schema(conn)
     conn.commit()
-    conn.close()
+    
+    # Produktkatalog einmalig in den Arbeitsspeicher laden
+    catalog.load(conn)
 
 # Routes
 @app.route('/')
@@ -84,147 +107,107 @@ def static_files(filename):
 # Product management
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products ORDER BY name')
-    products = []
-    for row in cursor.fetchall():
-        products.append({
-            'id': row[0],
-            'name': row[1],
-            'price': row[2],
-            'category': row[3],
-            'barcode': row[4],
-            'stock': row[5],
-            'created_at': row[6]
-        })
-    conn.close()
-    return jsonify(products)
+    # Aus dem Katalog im Arbeitsspeicher, mit ETag (siehe catalog.py)
+    return products_response(get_db())
 
 @app.route('/api/products', methods=['POST'])
 def add_product():
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute(
             'INSERT INTO products (name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?)',
             (data['name'], data['price'], data.get('category', ''), data.get('barcode', ''), data.get('stock', 0))
         )
-        conn.commit()
         product_id = cursor.lastrowid
-        conn.close()
+        record_changes(conn, [product_id], 'insert')
+        conn.commit()
+        catalog.refresh(conn, [product_id])
+        publish_product_changes([product_id])
         return jsonify({'success': True, 'id': product_id})
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'success': False, 'error': 'Barcode bereits vorhanden'})
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         'UPDATE products SET name=?, price=?, category=?, barcode=?, stock=? WHERE id=?',
         (data['name'], data['price'], data.get('category', ''), data.get('barcode', ''), data.get('stock', 0), product_id)
     )
+    record_changes(conn, [product_id], 'update')
     conn.commit()
-    conn.close()
+    catalog.refresh(conn, [product_id])
+    publish_product_changes([product_id])
     return jsonify({'success': True})
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('DELETE FROM products WHERE id=?', (product_id,))
+    record_changes(conn, [product_id], 'delete')
     conn.commit()
-    conn.close()
+    catalog.refresh(conn, [product_id])
+    publish_product_changes([product_id])
     return jsonify({'success': True})
 
 @app.route('/api/products/search/<barcode>')
 def search_product_by_barcode(barcode):
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products WHERE barcode=?', (barcode,))
-    row = cursor.fetchone()
-    if row:
-        product = {
-            'id': row[0],
-            'name': row[1],
-            'price': row[2],
-            'category': row[3],
-            'barcode': row[4],
-            'stock': row[5]
-        }
-        conn.close()
+    product = catalog.find_by_barcode(get_db(), barcode)
+    if product:
+        product = {key: value for key, value in product.items() if key != 'created_at'}
         return jsonify({'success': True, 'product': product})
     else:
-        conn.close()
         return jsonify({'success': False, 'error': 'Produkt nicht gefunden'})
 
 # Sales management
 @app.route('/api/sales', methods=['POST'])
 def create_sale():
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
+    conn = get_db()
     
     try:
-        # Create sale record
-        cursor.execute(
-            'INSERT INTO sales (total_amount, payment_method, cashier) VALUES (?, ?, ?)',
-            (data['total_amount'], data['payment_method'], data.get('cashier', 'System'))
-        )
-        sale_id = cursor.lastrowid
-        
-        # Add sale items and update stock
-        for item in data['items']:
-            cursor.execute(
-                'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
-                (sale_id, item['product_id'], item['quantity'], item['unit_price'], item['total_price'])
-            )
-            # Update stock
-            cursor.execute(
-                'UPDATE products SET stock = stock - ? WHERE id = ?',
-                (item['quantity'], item['product_id'])
-            )
-        
-        conn.commit()
-        conn.close()
+        # Beleg, Positionen und Lagerbestand in einer Transaktion schreiben
+        sale_id = insert_sale(conn, data)
         return jsonify({'success': True, 'sale_id': sale_id})
     except Exception as e:
         conn.rollback()
-        conn.close()
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/sales', methods=['GET'])
 def get_sales():
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT s.*, COUNT(si.id) as item_count
-        FROM sales s
-        LEFT JOIN sale_items si ON s.id = si.sale_id
-        GROUP BY s.id
-        ORDER BY s.created_at DESC
-        LIMIT 100
-    ''')
+    # Seitenweise per Cursor: ?before_id=&limit=&from=&to=&cashier=&payment_method=
+    try:
+        args = sales_query_args(request.args)
+        rows = query_sales(get_db(), **args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     sales = []
-    for row in cursor.fetchall():
+    for row in rows:
         sales.append({
-            'id': row[0],
-            'total_amount': row[1],
-            'payment_method': row[2],
-            'created_at': row[3],
-            'cashier': row[4],
-            'item_count': row[5]
+            'id': row['id'],
+            'total_amount': row['total_amount'],
+            'payment_method': row['payment_method'],
+            'created_at': row['created_at'],
+            'cashier': row['cashier'],
+            'item_count': row['item_count'],
+            'total_quantity': row['total_quantity']
         })
-    conn.close()
-    return jsonify(sales)
+    
+    response = jsonify(sales)
+    # Eine kürzere Seite ist die letzte, dann gibt es keinen Cursor mehr
+    if len(sales) == args['limit']:
+        response.headers['X-Next-Before-Id'] = str(sales[-1]['id'])
+    return response
 
 @app.route('/api/sales/<int:sale_id>')
 def get_sale_details(sale_id):
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get sale info
@@ -259,76 +242,19 @@ def get_sale_details(sale_id):
         'items': items
     }
     
-    conn.close()
     return jsonify(sale)
 
 # Reports
 @app.route('/api/reports/daily')
 def daily_report():
     date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    
-    # Daily sales summary
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as transaction_count,
-            SUM(total_amount) as total_revenue,
-            AVG(total_amount) as avg_transaction,
-            payment_method,
-            COUNT(*) as payment_count
-        FROM sales 
-        WHERE DATE(created_at) = ?
-        GROUP BY payment_method
-    ''', (date,))
-    
-    payment_summary = []
-    total_revenue = 0
-    total_transactions = 0
-    
-    for row in cursor.fetchall():
-        payment_summary.append({
-            'payment_method': row[3],
-            'count': row[4],
-            'amount': row[1] if row[1] else 0
-        })
-        if row[1]:
-            total_revenue += row[1]
-        total_transactions += row[0]
-    
-    # Top selling products
-    cursor.execute('''
-        SELECT 
-            p.name,
-            SUM(si.quantity) as total_quantity,
-            SUM(si.total_price) as total_revenue
-        FROM sale_items si
-        JOIN products p ON si.product_id = p.id
-        JOIN sales s ON si.sale_id = s.id
-        WHERE DATE(s.created_at) = ?
-        GROUP BY p.id, p.name
-        ORDER BY total_quantity DESC
-        LIMIT 10
-    ''', (date,))
-    
-    top_products = []
-    for row in cursor.fetchall():
-        top_products.append({
-            'name': row[0],
-            'quantity': row[1],
-            'revenue': row[2]
-        })
-    
-    conn.close()
-    
-    return jsonify({
-        'date': date,
-        'total_revenue': total_revenue,
-        'total_transactions': total_transactions,
-        'avg_transaction': total_revenue / total_transactions if total_transactions > 0 else 0,
-        'payment_summary': payment_summary,
-        'top_products': top_products
-    })
+    try:
+        day_range(date)
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum'}), 400
+
+    # Aus den vorverdichteten Tageswerten lesen (siehe reports.py)
+    return jsonify(build_daily_report(get_db(), date))
 
 if __name__ == '__main__':
     init_db()
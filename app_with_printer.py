@@ -5,20 +5,48 @@ import json
 from datetime import datetime, timedelta
 import os
 
+from catalog import catalog, add_catalog_routes, publish_product_changes, record_changes, products_response
+from database import get_db, init_app, upgrade_schema, day_range
+from events import add_event_routes, broker
+from metrics import add_metrics_routes
+from product_import import add_import_routes
+from product_search import add_search_routes
+from print_queue import PrintQueue, add_print_queue_routes
+from receipts import get_or_render_receipt, receipts_in_range
+from reports import build_daily_report
+from sales_export import add_export_routes
+from sales import add_sales_routes, insert_sale, query_sales, sales_query_args
+from slow_queries import add_slow_query_routes
+
 # Drucker Support importieren
-try:
-    from printer_support import EpsonTMT88VPrinter, add_printer_routes
-    PRINTER_AVAILABLE = True
-except ImportError:
-    PRINTER_AVAILABLE = False
-    print("⚠️  Drucker-Support nicht verfügbar. Installieren Sie pywin32 für Windows-Druckfunktionen.")
+# Ohne pywin32 nur mit KASSENSYSTEM_PRINTER (tcp://, /dev/usb/lp*, virtual://)
+from printer_support import printer_manager, printer_monitor, receipt_formatter, add_printer_routes
+from printer_transports import printer_configured
+PRINTER_AVAILABLE = printer_configured()
+if not PRINTER_AVAILABLE:
+    print("⚠️  Drucker-Support nicht verfügbar. Installieren Sie pywin32 oder setzen Sie KASSENSYSTEM_PRINTER.")
+
+# Mit Debug-Modus startet "python app_with_printer.py" über den Reloader
+DEBUG = True
 
 app = Flask(__name__)
 CORS(app)
+add_metrics_routes(app)
+add_slow_query_routes(app)
+init_app(app)
+add_catalog_routes(app)
+add_import_routes(app)
+add_search_routes(app)
+add_export_routes(app)
+add_event_routes(app)
+# Statusänderungen des Druckers live an die Kassen melden
+printer_monitor.add_listener(lambda snapshot: broker.publish('printer-status', snapshot))
+# Offline-Verkäufe: Belege speichern, aber nicht nachträglich drucken
+add_sales_routes(app, render_receipt=receipt_formatter.format_receipt)
 
 # Database initialization (same as original)
 def init_db():
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Products table
@@ -78,8 +106,32 @@ def init_db():
             sample_products
         )
     
+    upgrade_schema(conn)
     conn.commit()
-    conn.close()
+    
+    # Produktkatalog einmalig in den Arbeitsspeicher laden
+    catalog.load(conn)
+    
+    start_background_workers()
+
+def start_background_workers():
+    """
+    Startet Druckwarteschlange und Druckerüberwachung
+    Wird von init_db aufgerufen, damit auch unter einem WSGI-Server oder im
+    Lasttest gedruckt wird. Im Elternprozess des Debug-Reloaders laufen keine
+    Anfragen; ein zweiter Worker würde dort mitdrucken und eine zweite
+    Druckerverbindung belegen
+    :return: True, wenn die Hintergrund-Threads laufen
+    """
+    if not PRINTER_AVAILABLE:
+        return False
+    if __name__ == '__main__' and DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return False
+    print_queue.start()
+    print("🖨️  Druckwarteschlange: Gestartet")
+    printer_monitor.start()
+    print("🖨️  Druckerüberwachung: Gestartet")
+    return True
 
 # Routes (same as original app.py)
 @app.route('/')
@@ -93,163 +145,119 @@ def static_files(filename):
 # Product management
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products ORDER BY name')
-    products = []
-    for row in cursor.fetchall():
-        products.append({
-            'id': row[0],
-            'name': row[1],
-            'price': row[2],
-            'category': row[3],
-            'barcode': row[4],
-            'stock': row[5],
-            'created_at': row[6]
-        })
-    conn.close()
-    return jsonify(products)
+    # Aus dem Katalog im Arbeitsspeicher, mit ETag (siehe catalog.py)
+    return products_response(get_db())
 
 @app.route('/api/products', methods=['POST'])
 def add_product():
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute(
             'INSERT INTO products (name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?)',
             (data['name'], data['price'], data.get('category', ''), data.get('barcode', ''), data.get('stock', 0))
         )
-        conn.commit()
         product_id = cursor.lastrowid
-        conn.close()
+        record_changes(conn, [product_id], 'insert')
+        conn.commit()
+        catalog.refresh(conn, [product_id])
+        publish_product_changes([product_id])
         return jsonify({'success': True, 'id': product_id})
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'success': False, 'error': 'Barcode bereits vorhanden'})
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute(
         'UPDATE products SET name=?, price=?, category=?, barcode=?, stock=? WHERE id=?',
         (data['name'], data['price'], data.get('category', ''), data.get('barcode', ''), data.get('stock', 0), product_id)
     )
+    record_changes(conn, [product_id], 'update')
     conn.commit()
-    conn.close()
+    catalog.refresh(conn, [product_id])
+    publish_product_changes([product_id])
     return jsonify({'success': True})
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('DELETE FROM products WHERE id=?', (product_id,))
+    record_changes(conn, [product_id], 'delete')
     conn.commit()
-    conn.close()
+    catalog.refresh(conn, [product_id])
+    publish_product_changes([product_id])
     return jsonify({'success': True})
 
 @app.route('/api/products/search/<barcode>')
 def search_product_by_barcode(barcode):
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products WHERE barcode=?', (barcode,))
-    row = cursor.fetchone()
-    if row:
-        product = {
-            'id': row[0],
-            'name': row[1],
-            'price': row[2],
-            'category': row[3],
-            'barcode': row[4],
-            'stock': row[5]
-        }
-        conn.close()
+    product = catalog.find_by_barcode(get_db(), barcode)
+    if product:
+        product = {key: value for key, value in product.items() if key != 'created_at'}
         return jsonify({'success': True, 'product': product})
     else:
-        conn.close()
         return jsonify({'success': False, 'error': 'Produkt nicht gefunden'})
 
 # Enhanced Sales management with printer support
 @app.route('/api/sales', methods=['POST'])
 def create_sale():
     data = request.json
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
+    conn = get_db()
     
     try:
-        # Create sale record
-        cursor.execute(
-            'INSERT INTO sales (total_amount, payment_method, cashier) VALUES (?, ?, ?)',
-            (data['total_amount'], data['payment_method'], data.get('cashier', 'System'))
-        )
-        sale_id = cursor.lastrowid
-        
-        # Add sale items and update stock
-        for item in data['items']:
-            cursor.execute(
-                'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
-                (sale_id, item['product_id'], item['quantity'], item['unit_price'], item['total_price'])
-            )
-            # Update stock
-            cursor.execute(
-                'UPDATE products SET stock = stock - ? WHERE id = ?',
-                (item['quantity'], item['product_id'])
-            )
-        
-        conn.commit()
-        
-        # Automatisches Drucken wenn Drucker verfügbar
-        print_result = None
-        if PRINTER_AVAILABLE and data.get('auto_print', True):
-            print_result = print_sale_receipt(sale_id)
-            if print_result and print_result.get('success'):
-                cursor.execute('UPDATE sales SET printed = 1 WHERE id = ?', (sale_id,))
-                conn.commit()
-        
-        conn.close()
+        # Beleg, Positionen und Lagerbestand in einer Transaktion schreiben;
+        # gedruckt wird im Hintergrund über die Druckwarteschlange
+        auto_print = PRINTER_AVAILABLE and data.get('auto_print', True)
+        # Beleg gleich mit erzeugen und speichern, damit Nachdrucke ihn 1:1 wiederholen
+        sale_id = insert_sale(conn, data, enqueue_print=auto_print,
+                              render_receipt=receipt_formatter.format_receipt)
         
         result = {'success': True, 'sale_id': sale_id}
-        if print_result:
-            result['print_result'] = print_result
+        if auto_print:
+            print_queue.notify()
+            result['print_queued'] = True
             
         return jsonify(result)
         
     except Exception as e:
         conn.rollback()
-        conn.close()
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/sales', methods=['GET'])
 def get_sales():
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT s.*, COUNT(si.id) as item_count
-        FROM sales s
-        LEFT JOIN sale_items si ON s.id = si.sale_id
-        GROUP BY s.id
-        ORDER BY s.created_at DESC
-        LIMIT 100
-    ''')
+    # Seitenweise per Cursor: ?before_id=&limit=&from=&to=&cashier=&payment_method=
+    try:
+        args = sales_query_args(request.args)
+        rows = query_sales(get_db(), **args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     sales = []
-    for row in cursor.fetchall():
+    for row in rows:
         sales.append({
-            'id': row[0],
-            'total_amount': row[1],
-            'payment_method': row[2],
-            'created_at': row[3],
-            'cashier': row[4],
-            'printed': bool(row[5]) if len(row) > 5 else False,
-            'item_count': row[-1]
+            'id': row['id'],
+            'total_amount': row['total_amount'],
+            'payment_method': row['payment_method'],
+            'created_at': row['created_at'],
+            'cashier': row['cashier'],
+            'printed': bool(row['printed']),
+            'item_count': row['item_count'],
+            'total_quantity': row['total_quantity']
         })
-    conn.close()
-    return jsonify(sales)
+    
+    response = jsonify(sales)
+    # Eine kürzere Seite ist die letzte, dann gibt es keinen Cursor mehr
+    if len(sales) == args['limit']:
+        response.headers['X-Next-Before-Id'] = str(sales[-1]['id'])
+    return response
 
 @app.route('/api/sales/<int:sale_id>')
 def get_sale_details(sale_id):
-    conn = sqlite3.connect('kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     # Get sale info
@@ -257,7 +265,6 @@ def get_sale_details(sale_id):
     sale_row = cursor.fetchone()
     
     if not sale_row:
-        conn.close()
         return jsonify({'error': 'Verkauf nicht gefunden'}), 404
     
     # Get sale items
@@ -289,61 +296,41 @@ def get_sale_details(sale_id):
         'items': items
     }
     
-    conn.close()
     return jsonify(sale)
 
 # Printer-specific routes
-def print_sale_receipt(sale_id):
-    """Helper function to print a receipt for a sale"""
+def print_sale_receipt(sale_id, open_drawer=False):
+    """
+    Helper function to print a receipt for a sale
+    Druckt den beim Verkauf gespeicherten Beleg; Papierschnitt und ggf.
+    Kassenschublade gehen im selben Druckjob raus
+    :param open_drawer: Kassenschublade bei Barzahlung öffnen
+    """
     if not PRINTER_AVAILABLE:
         return {'success': False, 'error': 'Drucker nicht verfügbar'}
     
-    # Get sale data
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM sales WHERE id=?', (sale_id,))
-    sale_row = cursor.fetchone()
-    
-    if not sale_row:
-        conn.close()
+    conn = get_db()
+    receipt = get_or_render_receipt(conn, sale_id, receipt_formatter.format_receipt)
+    if receipt is None:
         return {'success': False, 'error': 'Verkauf nicht gefunden'}
     
-    cursor.execute('''
-        SELECT si.*, p.name
-        FROM sale_items si
-        JOIN products p ON si.product_id = p.id
-        WHERE si.sale_id = ?
-    ''', (sale_id,))
+    if open_drawer:
+        row = conn.execute('SELECT payment_method FROM sales WHERE id = ?', (sale_id,)).fetchone()
+        open_drawer = row[0] == 'Bargeld'
     
-    items = []
-    for row in cursor.fetchall():
-        items.append({
-            'name': row[6],
-            'quantity': row[3],
-            'unit_price': row[4],
-            'total_price': row[5]
-        })
-    
-    conn.close()
-    
-    # Prepare sale data for printer
-    sale_data = {
-        'sale_id': sale_row[0],
-        'total_amount': sale_row[1],
-        'payment_method': sale_row[2],
-        'created_at': sale_row[3],
-        'cashier': sale_row[4],
-        'items': items
-    }
-    
-    # Print receipt
+    return send_receipt(receipt, open_drawer)
+
+def send_receipt(receipt, open_drawer=False):
+    """Sendet gespeicherte Belegbytes an den Drucker"""
     try:
-        printer = EpsonTMT88VPrinter()
-        result = printer.print_receipt(sale_data)
-        return result
+        result = printer_manager.print_rendered(receipt, cut=True, open_drawer=open_drawer)
     except Exception as e:
-        return {'success': False, 'error': str(e)}
+        result = {'success': False, 'error': str(e)}
+    
+    if not result.get('success'):
+        # Druckerstatus sofort neu abfragen statt auf das nächste Intervall zu warten
+        printer_monitor.request_refresh()
+    return result
 
 @app.route('/api/sales/<int:sale_id>/print', methods=['POST'])
 def reprint_receipt(sale_id):
@@ -352,81 +339,53 @@ def reprint_receipt(sale_id):
     
     # Update printed status if successful
     if result.get('success'):
-        conn = sqlite3.connect('kassensystem.db')
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('UPDATE sales SET printed = 1 WHERE id = ?', (sale_id,))
         conn.commit()
-        conn.close()
     
     return jsonify(result)
 
+@app.route('/api/sales/reprint', methods=['POST'])
+def reprint_receipts():
+    """Druckt die gespeicherten Belege eines ID-Bereichs erneut: {"from_id": 1, "to_id": 50}"""
+    if not PRINTER_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Drucker nicht verfügbar'})
+    
+    data = request.json or {}
+    try:
+        first_id = int(data['from_id'])
+        last_id = int(data.get('to_id', first_id))
+        conn = get_db()
+        receipts = list(receipts_in_range(conn, first_id, last_id, receipt_formatter.format_receipt))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    printed = []
+    failed = []
+    for sale_id, receipt in receipts:
+        result = send_receipt(receipt)
+        if result.get('success'):
+            printed.append(sale_id)
+        else:
+            failed.append({'sale_id': sale_id, 'error': result.get('error')})
+    
+    conn.executemany('UPDATE sales SET printed = 1 WHERE id = ?', [(sale_id,) for sale_id in printed])
+    conn.commit()
+    
+    return jsonify({'success': not failed, 'printed': printed, 'failed': failed})
+
 # Reports (same as original)
 @app.route('/api/reports/daily')
 def daily_report():
     date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-    conn = sqlite3.connect('kassensystem.db')
-    cursor = conn.cursor()
-    
-    # Daily sales summary
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as transaction_count,
-            SUM(total_amount) as total_revenue,
-            AVG(total_amount) as avg_transaction,
-            payment_method,
-            COUNT(*) as payment_count
-        FROM sales 
-        WHERE DATE(created_at) = ?
-        GROUP BY payment_method
-    ''', (date,))
-    
-    payment_summary = []
-    total_revenue = 0
-    total_transactions = 0
-    
-    for row in cursor.fetchall():
-        payment_summary.append({
-            'payment_method': row[3],
-            'count': row[4],
-            'amount': row[1] if row[1] else 0
-        })
-        if row[1]:
-            total_revenue += row[1]
-        total_transactions += row[0]
-    
-    # Top selling products
-    cursor.execute('''
-        SELECT 
-            p.name,
-            SUM(si.quantity) as total_quantity,
-            SUM(si.total_price) as total_revenue
-        FROM sale_items si
-        JOIN products p ON si.product_id = p.id
-        JOIN sales s ON si.sale_id = s.id
-        WHERE DATE(s.created_at) = ?
-        GROUP BY p.id, p.name
-        ORDER BY total_quantity DESC
-        LIMIT 10
-    ''', (date,))
-    
-    top_products = []
-    for row in cursor.fetchall():
-        top_products.append({
-            'name': row[0],
-            'quantity': row[1],
-            'revenue': row[2]
-        })
-    
-    conn.close()
-    
-    return jsonify({
-        'date': date,
-        'total_revenue': total_revenue,
-        'total_transactions': total_transactions,
-        'avg_transaction': total_revenue / total_transactions if total_transactions > 0 else 0,
-        'payment_summary': payment_summary,
-        'top_products': top_products
-    })
+    try:
+        day_range(date)
+    except ValueError:
+        return jsonify({'error': 'Ungültiges Datum'}), 400
+
+    # Aus den vorverdichteten Tageswerten lesen (siehe reports.py)
+    return jsonify(build_daily_report(get_db(), date))
 
 # System info
 @app.route('/api/system/info')
@@ -443,21 +402,29 @@ def system_info():
     }
     
     if PRINTER_AVAILABLE:
-        try:
-            printer = EpsonTMT88VPrinter()
-            printers = printer.list_printers()
-            epson_printer = printer.find_epson_printer()
-            
-            info['printers'] = {
-                'available': printers,
-                'epson_found': epson_printer,
-                'current': printer.printer_name
-            }
-        except Exception as e:
-            info['printer_error'] = str(e)
+        # Druckerliste aus dem PrinterMonitor statt den Spooler bei jeder Anfrage abzufragen
+        snapshot = printer_monitor.snapshot()
+        if 'printers' in snapshot:
+            info['printers'] = snapshot['printers']
+        else:
+            info['printer_error'] = snapshot['printer_error']
+        info['printer_checked_at'] = snapshot['checked_at']
+        info['printer_age_seconds'] = snapshot['age_seconds']
     
     return jsonify(info)
 
+def print_new_sale_receipt(sale_id, attempts):
+    """
+    Erstdruck aus der Warteschlange; öffnet bei Barzahlung die Kassenschublade
+    Nur beim ersten Versuch, damit sie bei Wiederholungen nicht Minuten
+    später erneut aufspringt
+    """
+    return print_sale_receipt(sale_id, open_drawer=attempts == 0)
+
+# Druckwarteschlange: Belege werden im Hintergrund gedruckt
+print_queue = PrintQueue(print_new_sale_receipt)
+add_print_queue_routes(app, print_queue)
+
 # Add printer routes if available
 if PRINTER_AVAILABLE:
     add_printer_routes(app)
@@ -471,10 +438,9 @@ if __name__ == '__main__':
     if PRINTER_AVAILABLE:
         print("🖨️  Drucker-Support: Aktiviert")
         try:
-            printer = EpsonTMT88VPrinter()
-            print(f"🖨️  Aktueller Drucker: {printer.printer_name}")
+            print(f"🖨️  Aktueller Drucker: {printer_manager.printer_name}")
             
-            epson = printer.find_epson_printer()
+            epson = printer_manager.find_epson_printer()
             if epson:
                 print(f"🖨️  Epson TMT88V gefunden: {epson}")
             else:
@@ -485,6 +451,7 @@ if __name__ == '__main__':
     else:
         print("❌ Drucker-Support: Nicht verfügbar")
         print("   Installieren Sie pywin32: pip install pywin32")
+        print("   Oder Drucker angeben: KASSENSYSTEM_PRINTER=tcp://192.168.1.50:9100")
     
     print("")
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    app.run(debug=DEBUG, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Benchmark für den Schreibpfad von create_sale
+Vergleicht den früheren Ablauf (2 Statements pro Position) mit dem
+gebündelten Pfad aus sales.insert_sale bei 1, 10 und 100 Positionen.
+Beide Varianten erledigen dieselbe Arbeit: Tageswerte, Katalogversion,
+Produktkatalog und Ereignisse; nur das Schreiben des Warenkorbs unterscheidet sich.
+
+Aufruf:
+    python benchmarks/bench_create_sale.py [--sales 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import catalog, publish_product_changes, record_changes
+from database import ConnectionPool, upgrade_schema
+from sales import insert_sale, publish_sale
+from reports import record_sale_rollups
+
+PRODUCT_COUNT = 200
+
+
+def create_schema(conn):
+    """Legt das Schema wie init_db() an und füllt Testprodukte ein"""
+    conn.executescript('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            category TEXT,
+            barcode TEXT UNIQUE,
+            stock INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            total_amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            cashier TEXT DEFAULT 'System'
+        );
+        CREATE TABLE sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL
+        );
+    ''')
+    conn.executemany(
+        'INSERT INTO products (name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?)',
+        [(f'Artikel {i}', 1.0, 'Test', f'BC{i:06d}', 10 ** 9) for i in range(PRODUCT_COUNT)]
+    )
+    upgrade_schema(conn)
+    conn.commit()
+
+
+def insert_sale_per_item(conn, data):
+    """Früherer Ablauf: ein INSERT und ein UPDATE pro Position"""
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(
+        'INSERT INTO sales (total_amount, payment_method, cashier) VALUES (?, ?, ?)',
+        (data['total_amount'], data['payment_method'], data.get('cashier', 'System'))
+    )
+    sale_id = cursor.lastrowid
+    for item in data['items']:
+        cursor.execute(
+            'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
+            (sale_id, item['product_id'], item['quantity'], item['unit_price'], item['total_price'])
+        )
+        cursor.execute(
+            'UPDATE products SET stock = stock - ? WHERE id = ?',
+            (item['quantity'], item['product_id'])
+        )
+    record_sale_rollups(conn, sale_id)
+    product_ids = [item['product_id'] for item in data['items']]
+    record_changes(conn, product_ids, 'update')
+    conn.commit()
+    catalog.refresh(conn, product_ids)
+    publish_product_changes(product_ids, 'stock-changed')
+    publish_sale(sale_id, data)
+    return sale_id
+
+
+def make_sale(item_count):
+    items = [
+        {'product_id': i % PRODUCT_COUNT + 1, 'quantity': 1, 'unit_price': 1.0, 'total_price': 1.0}
+        for i in range(item_count)
+    ]
+    return {'total_amount': float(item_count), 'payment_method': 'Bargeld', 'items': items}
+
+
+def run(writer, item_count, sale_count):
+    """Führt sale_count Verkäufe aus und gibt Verkäufe pro Sekunde zurück"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'bench.db'))
+        conn = pool.get()
+        create_schema(conn)
+        catalog.load(conn)
+        data = make_sale(item_count)
+
+        start = time.perf_counter()
+        for _ in range(sale_count):
+            writer(conn, data)
+        elapsed = time.perf_counter() - start
+
+        pool.release()
+        pool.close_all()
+    return sale_count / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sales', type=int, default=500, help='Verkäufe pro Messung')
+    args = parser.parse_args()
+
+    print(f"{'Positionen':>10} {'pro Position':>16} {'gebündelt':>16} {'Faktor':>8}")
+    for item_count in (1, 10, 100):
+        legacy = run(insert_sale_per_item, item_count, args.sales)
+        batched = run(insert_sale, item_count, args.sales)
+        print(f"{item_count:>10} {legacy:>12.0f} /s {batched:>12.0f} /s {batched / legacy:>7.2f}x")
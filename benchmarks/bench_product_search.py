@@ -0,0 +1,113 @@
+"""
+Benchmark für die Produktsuche (FTS5)
+Legt eine temporäre Datenbank mit einem großen Katalog an und misst
+typische Suchanfragen: kurzes Präfix, ganzes Wort, mehrere Begriffe,
+Kategoriefilter und Tippfehler. Zum Vergleich läuft dieselbe Namenssuche
+als LIKE '%...%' über die ganze Tabelle.
+
+Aufruf:
+    python benchmarks/bench_product_search.py [--products 100000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionPool, upgrade_schema
+from product_search import search_products
+
+BRANDS = ['Alpenhof', 'Bergquell', 'Sonnenfeld', 'Nordlicht', 'Landliebe', 'Gutsherr', 'Müllerhof']
+NOUNS = ['Schokolade', 'Müsli', 'Joghurt', 'Apfelsaft', 'Orangensaft', 'Vollkornbrot', 'Kaffee',
+         'Tee', 'Butter', 'Käse', 'Salami', 'Nudeln', 'Reis', 'Tomaten', 'Chips', 'Kekse',
+         'Mineralwasser', 'Limonade', 'Honig', 'Marmelade']
+VARIANTS = ['Vollmilch', 'Zartbitter', 'Bio', 'Classic', 'Light', 'Extra', 'Natur', 'Erdbeer',
+            'Vanille', 'Haselnuss', 'Family', 'Mini', 'Spezial']
+CATEGORIES = ['Süßwaren', 'Frühstück', 'Molkereiprodukte', 'Getränke', 'Backwaren', 'Snacks',
+              'Feinkost', 'Grundnahrung']
+
+QUERIES = [
+    ('Präfix (2 Zeichen)', 'sc', None),
+    ('Präfix (4 Zeichen)', 'scho', None),
+    ('Ganzes Wort', 'haselnuss', None),
+    ('Mehrere Begriffe', 'bio schoko', None),
+    ('Mit Kategorie', 'vanille', 'Molkereiprodukte'),
+    ('Tippfehler', 'schokolsde', None),
+    ('Tippfehler Präfix', 'joguhrt', None),
+]
+
+
+def create_catalog(conn, count, seed=42):
+    conn.execute('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            category TEXT,
+            barcode TEXT UNIQUE,
+            stock INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE TABLE sales (id INTEGER PRIMARY KEY, total_amount REAL, payment_method TEXT, '
+                 'created_at TIMESTAMP, cashier TEXT)')
+    conn.execute('CREATE TABLE sale_items (id INTEGER PRIMARY KEY, sale_id INTEGER, product_id INTEGER, '
+                 'quantity INTEGER, unit_price REAL, total_price REAL)')
+    upgrade_schema(conn)
+
+    rng = random.Random(seed)
+    rows = (
+        (f'{rng.choice(BRANDS)} {rng.choice(NOUNS)} {rng.choice(VARIANTS)} {rng.randint(100, 999)}g',
+         round(rng.uniform(0.3, 15), 2), rng.choice(CATEGORIES), f'{4000000000000 + i}', rng.randint(0, 200))
+        for i in range(count)
+    )
+    conn.executemany(
+        'INSERT INTO products (name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?)', rows
+    )
+    conn.commit()
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = ConnectionPool(os.path.join(directory, 'bench.db')).connect()
+        start = time.perf_counter()
+        create_catalog(conn, args.products)
+        print(f'{args.products} Produkte angelegt in {time.perf_counter() - start:.1f}s\n')
+
+        print(f"{'Anfrage':<22} {'Median':>9} {'p95':>9} {'Treffer':>8}  Erster Treffer")
+        for label, query, category in QUERIES:
+            median, p95, (rows, fuzzy) = measure(
+                lambda: search_products(conn, query, category, limit=20), args.repeat
+            )
+            first = rows[0][1] if rows else '-'
+            print(f"{label:<22} {median:>7.2f}ms {p95:>7.2f}ms {len(rows):>8}  {first}{' (korrigiert)' if fuzzy else ''}")
+
+        median, p95, _ = measure(lambda: conn.execute(
+            "SELECT id, name FROM products WHERE name LIKE ? ORDER BY name LIMIT 20", ('%haselnuss%',)
+        ).fetchall(), max(5, args.repeat // 10))
+        print(f"\n{'LIKE-Suche (Vergleich)':<22} {median:>7.2f}ms {p95:>7.2f}ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
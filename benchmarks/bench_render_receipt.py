@@ -0,0 +1,111 @@
+"""
+Benchmark für das Erzeugen von Belegen
+Vergleicht den früheren Ablauf (Text formatieren, in eine temporäre Datei
+schreiben, als Bytes zurücklesen, Datei löschen) mit dem ESC/POS Puffer
+aus EpsonTMT88VPrinter.format_receipt
+
+Aufruf:
+    python benchmarks/bench_render_receipt.py [--receipts 5000] [--items 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printer_support import EpsonTMT88VPrinter
+from printer_transports import VirtualTransport
+
+
+def make_sale(item_count):
+    items = [
+        {'name': f'Müsliriegel {i}', 'quantity': 2, 'unit_price': 0.99, 'total_price': 1.98}
+        for i in range(item_count)
+    ]
+    return {'sale_id': 1, 'cashier': 'Kasse 1', 'payment_method': 'Bargeld',
+            'received_amount': 50.0, 'items': items}
+
+
+def format_receipt_text(printer, sale_data):
+    """Früheres Klartext-Layout von format_receipt"""
+    width = printer.width_chars
+    lines = [
+        printer.center_text("=" * width),
+        printer.center_text("KASSENSYSTEM"),
+        printer.center_text("Ihr Geschäft"),
+        printer.center_text("=" * width),
+        "",
+        f"Datum: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+        f"Beleg-Nr: {sale_data.get('sale_id', 'N/A')}",
+        f"Kassierer: {sale_data.get('cashier', 'System')}",
+        "-" * width,
+        "ARTIKEL",
+        "-" * width,
+    ]
+    total = 0
+    for item in sale_data['items']:
+        lines.append(f"{item['name'][:30]:<30}")
+        lines.append(f"  {item['quantity']} x {printer.format_price(item['unit_price'])} = "
+                     f"{printer.format_price(item['total_price']):>12}")
+        total += item['total_price']
+    received = sale_data['received_amount']
+    lines.extend([
+        "-" * width,
+        f"{'GESAMT:':>36} {printer.format_price(total):>10}",
+        "",
+        f"Zahlungsart: {sale_data['payment_method']}",
+        f"Erhalten:    {printer.format_price(received):>10}",
+        f"Rückgeld:    {printer.format_price(received - total):>10}",
+        "",
+        printer.center_text("Vielen Dank für Ihren Einkauf!"),
+        printer.center_text("Beleg bitte aufbewahren"),
+        "",
+        printer.center_text("Alle Preise inkl. 19% MwSt"),
+        "",
+        printer.center_text("=" * width),
+        "", "", "", "",
+    ])
+    return "\n".join(lines)
+
+
+def render_via_temp_file(printer, sale_data):
+    """Früherer Ablauf: Klartext über eine temporäre Datei in Bytes wandeln"""
+    text = format_receipt_text(printer, sale_data)
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
+        f.write(text)
+        temp_file = f.name
+    try:
+        with open(temp_file, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(temp_file)
+
+
+def render_in_memory(printer, sale_data):
+    return printer.format_receipt(sale_data, cut=True)
+
+
+def run(render, printer, sale_data, receipt_count):
+    """Erzeugt receipt_count Belege und gibt Belege pro Sekunde zurück"""
+    start = time.perf_counter()
+    for _ in range(receipt_count):
+        render(printer, sale_data)
+    return receipt_count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=5000, help='Belege pro Messung')
+    parser.add_argument('--items', type=int, default=10, help='Positionen pro Beleg')
+    args = parser.parse_args()
+
+    printer = EpsonTMT88VPrinter(transport=VirtualTransport())
+    sale_data = make_sale(args.items)
+
+    legacy = run(render_via_temp_file, printer, sale_data, args.receipts)
+    direct = run(render_in_memory, printer, sale_data, args.receipts)
+    print(f"{'Temp-Datei':>12} {legacy:>10.0f} Belege/s")
+    print(f"{'ESC/POS':>12} {direct:>10.0f} Belege/s {direct / legacy:>7.2f}x")
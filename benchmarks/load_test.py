@@ -0,0 +1,388 @@
+"""
+Lasttest mit mehreren gleichzeitigen Kassen
+Startet app.py (oder app_with_printer.py) mit einer temporären, befüllten
+Datenbank in einem eigenen HTTP-Server und lässt N simulierte Kassierer
+parallel typische Abläufe durchspielen:
+
+    Artikel scannen (GET /api/products/search/<barcode>, je Position)
+    → Verkauf abschließen (POST /api/sales)
+    → gelegentlich Verkaufsliste, Verkaufsdetails und Tagesbericht
+
+Gemessen wird die Antwortzeit jeder Anfrage aus Sicht der Kasse. Ausgegeben
+werden Durchsatz und p50/p95/p99 je Route; die Ergebnisse landen zusätzlich
+als JSON-Datei, die sich mit --compare gegen einen früheren Lauf vergleichen
+lässt. Es werden keine externen Dienste benötigt.
+
+Aufruf:
+    python benchmarks/load_test.py [--tills 8] [--duration 30] [--products 2000]
+                                   [--history 20000] [--output ergebnis.json]
+                                   [--compare alt.json] [--database gross.db]
+"""
+import argparse
+import http.client
+import importlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+PAYMENT_METHODS = ['Bargeld', 'Karte', 'Kontaktlos']
+PAYMENT_WEIGHTS = [45, 40, 15]
+# Wahrscheinlichkeit je abgeschlossenem Verkauf
+SALES_LIST_SHARE = 0.2
+SALE_DETAILS_SHARE = 0.1
+DAILY_REPORT_SHARE = 0.05
+
+
+def percentile(sorted_values, share):
+    """Perzentil nach dem Nearest-Rank-Verfahren"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(share * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def seed_database(conn, product_count, history_count, seed):
+    """
+    Füllt die Datenbank mit Produkten und vergangenen Verkäufen der letzten 90 Tage
+    :return: Liste der Barcodes
+    """
+    from reports import rebuild_rollups
+
+    rng = random.Random(seed)
+    start = conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+    conn.executemany(
+        'INSERT INTO products (name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?)',
+        [
+            (f'Lastartikel {i}', round(rng.uniform(0.3, 20), 2), f'Kategorie {i % 12}',
+             f'LT{i:08d}', 10 ** 9)
+            for i in range(start, start + product_count)
+        ]
+    )
+    products = conn.execute('SELECT id, price FROM products').fetchall()
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    sale_rows = []
+    item_rows = []
+    next_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM sales').fetchone()[0]
+    for sale_id in range(next_id, next_id + history_count):
+        basket = rng.sample(products, min(len(products), rng.randint(1, 12)))
+        total = 0
+        for product_id, price in basket:
+            quantity = rng.randint(1, 3)
+            total += price * quantity
+            item_rows.append((sale_id, product_id, quantity, price, price * quantity))
+        created_at = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+        sale_rows.append((
+            sale_id, round(total, 2),
+            rng.choices(PAYMENT_METHODS, PAYMENT_WEIGHTS)[0],
+            created_at.strftime('%Y-%m-%d %H:%M:%S'), f'Kasse {rng.randint(1, 6)}',
+            len(basket), sum(row[2] for row in item_rows[-len(basket):])
+        ))
+    conn.executemany(
+        'INSERT INTO sales (id, total_amount, payment_method, created_at, cashier, item_count, total_quantity) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', sale_rows
+    )
+    conn.executemany(
+        'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
+        item_rows
+    )
+    rebuild_rollups(conn)
+    return [row[0] for row in conn.execute('SELECT barcode FROM products')]
+
+
+class Till(threading.Thread):
+    """Eine simulierte Kasse mit eigener HTTP-Verbindung (Keep-Alive)"""
+
+    def __init__(self, number, host, port, barcodes, deadline, think_time, seed):
+        super().__init__(name=f'Kasse {number}', daemon=True)
+        self.number = number
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.barcodes = barcodes
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = random.Random(seed * 1000 + number)
+        self.samples = {}
+        self.errors = {}
+        self.sales = 0
+
+    def request(self, route, method, path, body=None):
+        """Sendet eine Anfrage, misst die Zeit bis zur vollständigen Antwort"""
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, payload, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        self.samples.setdefault(route, []).append(time.perf_counter() - start)
+        if response.status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        return json.loads(data) if data else None
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            self.serve_customer()
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+        self.connection.close()
+
+    def serve_customer(self):
+        rng = self.rng
+        cart = {}
+        for barcode in rng.sample(self.barcodes, min(len(self.barcodes), rng.randint(1, 15))):
+            data = self.request('scan', 'GET', f'/api/products/search/{barcode}')
+            if data and data.get('success'):
+                product = data['product']
+                quantity = rng.choices([1, 2, 3], [80, 15, 5])[0]
+                cart[product['id']] = {
+                    'product_id': product['id'],
+                    'quantity': quantity,
+                    'unit_price': product['price'],
+                    'total_price': round(product['price'] * quantity, 2)
+                }
+        if not cart:
+            return
+
+        items = list(cart.values())
+        result = self.request('create_sale', 'POST', '/api/sales', {
+            'items': items,
+            'total_amount': round(sum(item['total_price'] for item in items), 2),
+            'payment_method': rng.choices(PAYMENT_METHODS, PAYMENT_WEIGHTS)[0],
+            'cashier': f'Kasse {self.number}'
+        })
+        if result is None:
+            return
+        if not result.get('success'):
+            self.errors['create_sale'] = self.errors.get('create_sale', 0) + 1
+            return
+        self.sales += 1
+
+        if rng.random() < SALES_LIST_SHARE:
+            self.request('get_sales', 'GET', '/api/sales?limit=50')
+        if rng.random() < SALE_DETAILS_SHARE:
+            self.request('get_sale_details', 'GET', f"/api/sales/{result['sale_id']}")
+        if rng.random() < DAILY_REPORT_SHARE:
+            self.request('daily_report', 'GET', '/api/reports/daily')
+
+
+def start_server(module_name):
+    """Startet die App in einem HTTP/1.1-Server auf einem freien Port"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    module = importlib.import_module(module_name)
+    # Startet bei app_with_printer auch Druckwarteschlange und Druckerüberwachung,
+    # sonst würde der Lauf mit Drucker gar nicht drucken
+    module.init_db()
+    server = make_server('127.0.0.1', 0, module.app, threaded=True, request_handler=KeepAliveHandler)
+    server.module = module
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def print_job_counts(module):
+    """Stand der Druckwarteschlange nach dem Lauf, None ohne Drucker"""
+    print_queue = getattr(module, 'print_queue', None)
+    if print_queue is None or not module.PRINTER_AVAILABLE:
+        return None
+    from database import get_db, close_db
+    try:
+        stats = print_queue.stats(get_db())
+    finally:
+        close_db()
+    return dict(stats['counts'], worker_running=stats['worker_running'])
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def summarize(tills, elapsed):
+    """Fasst die Messwerte aller Kassen je Route zusammen"""
+    samples = {}
+    errors = {}
+    for till in tills:
+        for route, values in till.samples.items():
+            samples.setdefault(route, []).extend(values)
+        for route, count in till.errors.items():
+            errors[route] = errors.get(route, 0) + count
+
+    routes = {}
+    for route in sorted(set(samples) | set(errors)):
+        values = sorted(samples.get(route, []))
+        routes[route] = {
+            'requests': len(values),
+            'errors': errors.get(route, 0),
+            'throughput_per_second': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 3) if values else None,
+            'p95_ms': round(percentile(values, 0.95) * 1000, 3) if values else None,
+            'p99_ms': round(percentile(values, 0.99) * 1000, 3) if values else None,
+            'max_ms': round(values[-1] * 1000, 3) if values else None,
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'requests': total,
+        'requests_per_second': round(total / elapsed, 2),
+        'sales': sum(till.sales for till in tills),
+        'sales_per_second': round(sum(till.sales for till in tills) / elapsed, 2),
+        'routes': routes,
+    }
+
+
+def print_summary(summary):
+    print(f"\n{'Route':<18} {'Anfragen':>9} {'Fehler':>7} {'pro s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, values in summary['routes'].items():
+        print(f"{route:<18} {values['requests']:>9} {values['errors']:>7} "
+              f"{values['throughput_per_second']:>9.1f} "
+              + ' '.join(f"{values[key]:>7.2f}ms" if values[key] is not None else f"{'-':>9}"
+                         for key in ('p50_ms', 'p95_ms', 'p99_ms')))
+    print(f"\nGesamt: {summary['requests']} Anfragen ({summary['requests_per_second']:.1f}/s), "
+          f"{summary['sales']} Verkäufe ({summary['sales_per_second']:.1f}/s)")
+    if 'print_jobs' in summary:
+        jobs = summary['print_jobs']
+        print(f"Druckaufträge: {jobs['done']} gedruckt, {jobs['pending'] + jobs['printing']} offen, "
+              f"{jobs['failed']} fehlgeschlagen")
+
+
+def print_comparison(summary, previous):
+    """Vergleicht p95 und Durchsatz je Route mit einem früheren Lauf"""
+    print(f"\nVergleich mit {previous['meta'].get('git_revision') or 'früherem Lauf'} "
+          f"({previous['meta']['started_at']}):")
+    print(f"{'Route':<18} {'p95 alt':>10} {'p95 neu':>10} {'Änderung':>9} {'pro s alt':>10} {'pro s neu':>10}")
+    for route, values in summary['routes'].items():
+        old = previous['results']['routes'].get(route)
+        if not old or not old['p95_ms'] or values['p95_ms'] is None:
+            continue
+        change = (values['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+        print(f"{route:<18} {old['p95_ms']:>8.2f}ms {values['p95_ms']:>8.2f}ms {change:>+8.1f}% "
+              f"{old['throughput_per_second']:>10.1f} {values['throughput_per_second']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='app', choices=['app', 'app_with_printer'])
+    parser.add_argument('--tills', type=int, default=8, help='Anzahl gleichzeitiger Kassen')
+    parser.add_argument('--duration', type=float, default=30, help='Messdauer in Sekunden')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='Mittlere Pause zwischen Kunden in Sekunden (0 = Volllast)')
+    parser.add_argument('--products', type=int, default=2000, help='Anzahl Produkte in der Testdatenbank')
+    parser.add_argument('--history', type=int, default=20000, help='Anzahl vergangener Verkäufe')
+    parser.add_argument('--database', help='Vorhandene Datenbank kopieren statt eine neue zu befüllen '
+                                           '(z.B. von synthetic_data.py)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON-Ergebnisdatei (Standard: benchmarks/results/<Zeitpunkt>.json)')
+    parser.add_argument('--compare', help='Früheres Ergebnis zum Vergleich')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Die App liest den Datenbankpfad beim Import
+        os.environ['KASSENSYSTEM_DB'] = os.path.join(directory, 'lasttest.db')
+        os.environ.setdefault('KASSENSYSTEM_PRINTER', 'virtual://')
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        start = time.perf_counter()
+        if args.database:
+            # Kopie einer vorhandenen Datenbank, z.B. aus synthetic_data.py
+            with sqlite3.connect(args.database) as source, \
+                    sqlite3.connect(os.environ['KASSENSYSTEM_DB']) as target:
+                source.backup(target)
+            server = start_server(args.app)
+            conn = sqlite3.connect(os.environ['KASSENSYSTEM_DB'])
+            barcodes = [row[0] for row in conn.execute('SELECT barcode FROM products WHERE barcode IS NOT NULL')]
+            product_count, sale_count = (
+                conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('products', 'sales')
+            )
+            conn.close()
+        else:
+            server = start_server(args.app)
+            conn = sqlite3.connect(os.environ['KASSENSYSTEM_DB'])
+            barcodes = seed_database(conn, args.products, args.history, args.seed)
+            conn.commit()
+            conn.close()
+            # Produktkatalog der App um die neuen Produkte ergänzen
+            from catalog import catalog
+            from database import get_db, close_db
+            catalog.load(get_db())
+            close_db()
+            product_count, sale_count = args.products, args.history
+        print(f'Testdatenbank: {product_count} Produkte, {sale_count} Verkäufe '
+              f'({time.perf_counter() - start:.1f}s)')
+        print(f'{args.tills} Kassen, {args.duration:.0f}s, {args.app} auf Port {server.server_port} ...')
+
+        started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        deadline = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        tills = [
+            Till(number, '127.0.0.1', server.server_port, barcodes, deadline, args.think_time, args.seed)
+            for number in range(1, args.tills + 1)
+        ]
+        for till in tills:
+            till.start()
+        for till in tills:
+            till.join()
+        summary = summarize(tills, time.perf_counter() - start)
+        print_jobs = print_job_counts(server.module)
+        if print_jobs is not None:
+            summary['print_jobs'] = print_jobs
+        server.shutdown()
+
+    print_summary(summary)
+
+    result = {
+        'meta': {
+            'started_at': started_at,
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'parameters': vars(args),
+        'results': summary,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_test_{started_at.replace(':', '').replace('+0000', 'Z')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f'Ergebnis gespeichert: {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(summary, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Produktkatalog im Arbeitsspeicher
+Hält alle Produkte mit Index nach ID und Barcode vor, damit Barcode-Scans
+und die Produktliste ohne Datenbankzugriff beantwortet werden können.
+Die Schreib-Routen aktualisieren den Katalog nach jedem Commit.
+
+Jede Produktänderung erhöht die Katalogversion in catalog_state; sie dient
+als ETag für GET /api/products. Die geänderten Produkte landen zusätzlich in
+product_changes, damit Clients nur die Änderungen seit ihrer Version abholen.
+"""
+import threading
+
+from flask import current_app, request
+
+from database import get_db
+from events import broker
+
+PRODUCT_COLUMNS = 'id, name, price, category, barcode, stock, created_at'
+
+# So viele Versionen bleiben im Änderungsprotokoll; ältere Clients laden neu
+CHANGE_LOG_RETENTION = 10000
+# Ältere Einträge werden nur bei jeder n-ten Version gelöscht, nicht bei jedem Verkauf
+CHANGE_LOG_PRUNE_INTERVAL = 100
+
+
+def record_changes(conn, product_ids, operation):
+    """
+    Erhöht die Katalogversion und protokolliert die geänderten Produkte
+    Muss in derselben Transaktion wie die Produktänderung aufgerufen werden
+    :param operation: 'insert', 'update' oder 'delete'
+    """
+    conn.execute('UPDATE catalog_state SET version = version + 1 WHERE id = 1')
+    version = read_version(conn)
+    conn.executemany(
+        'INSERT OR REPLACE INTO product_changes (version, product_id, operation) VALUES (?, ?, ?)',
+        [(version, product_id, operation) for product_id in set(product_ids)]
+    )
+    if version % CHANGE_LOG_PRUNE_INTERVAL == 0:
+        conn.execute('DELETE FROM product_changes WHERE version <= ?', (version - CHANGE_LOG_RETENTION,))
+    return version
+
+
+def read_version(conn):
+    """Liest die aktuelle Katalogversion aus der Datenbank"""
+    return conn.execute('SELECT version FROM catalog_state WHERE id = 1').fetchone()[0]
+
+
+def product_from_row(row):
+    """Wandelt eine Zeile aus products in ein Produkt-Dictionary um"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'price': row[2],
+        'category': row[3],
+        'barcode': row[4],
+        'stock': row[5],
+        'created_at': row[6]
+    }
+
+
+class ProductCatalog:
+    """
+    Zwischenspeicher für die Tabelle products
+    Lookups nach Barcode und ID sind reine Dictionary-Zugriffe
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_barcode = {}
+        self._sorted = None
+        self._body = None
+        self.version = 0
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, conn):
+        """Liest den kompletten Katalog neu ein"""
+        with self._lock:
+            # Version vor den Zeilen lesen: lieber zu alt als zu neu
+            version = read_version(conn)
+            rows = conn.execute(f'SELECT {PRODUCT_COLUMNS} FROM products').fetchall()
+            self._by_id = {}
+            self._by_barcode = {}
+            for row in rows:
+                self._store(product_from_row(row))
+            self._invalidate()
+            self.version = version
+            self.loaded = True
+
+    def ensure_loaded(self, conn):
+        if not self.loaded:
+            self.load(conn)
+
+    def refresh(self, conn, product_ids):
+        """
+        Liest die angegebenen Produkte nach einer Änderung neu ein
+        Gelöschte Produkte werden dabei aus dem Katalog entfernt
+        """
+        product_ids = sorted(set(product_ids))
+        with self._lock:
+            version = read_version(conn)
+            if not self.loaded or version > self.version + 1:
+                # Es fehlen Änderungen anderer Schreiber: komplett neu laden
+                self.load(conn)
+                return
+            if product_ids:
+                placeholders = ', '.join('?' * len(product_ids))
+                rows = conn.execute(
+                    f'SELECT {PRODUCT_COLUMNS} FROM products WHERE id IN ({placeholders})', product_ids
+                ).fetchall()
+                for product_id in product_ids:
+                    self._discard(product_id)
+                for row in rows:
+                    self._store(product_from_row(row))
+            self._invalidate()
+            self.version = max(self.version, version)
+
+    def book_sale(self, conn, version, quantities):
+        """
+        Übernimmt die Bestandsänderung eines Verkaufs, ohne die Produkte neu zu lesen
+        Geht nur, wenn der Katalog genau auf dem Stand vor dem Verkauf ist;
+        sonst wird wie bei refresh() aus der Datenbank gelesen
+        :param version: Katalogversion aus record_changes für diesen Verkauf
+        :param quantities: {Produkt-ID: verkaufte Menge}
+        """
+        with self._lock:
+            products = [self._by_id.get(product_id) for product_id in quantities]
+            if (not self.loaded or version != self.version + 1
+                    or any(product is None or product['stock'] is None for product in products)):
+                self.refresh(conn, quantities)
+                return
+            for product in products:
+                # Neues Dictionary statt Änderung, andere Threads halten evtl. das alte
+                self._store(dict(product, stock=product['stock'] - quantities[product['id']]))
+            self._invalidate()
+            self.version = version
+
+    def get(self, product_id):
+        return self._by_id.get(product_id)
+
+    def find_by_barcode(self, conn, barcode):
+        """
+        Sucht ein Produkt per Barcode
+        Bei einem Fehltreffer wird in der Datenbank nachgesehen, falls ein
+        anderer Prozess das Produkt angelegt hat
+        """
+        self.ensure_loaded(conn)
+        product = self._by_barcode.get(barcode)
+        if product is not None:
+            self.hits += 1
+            return product
+
+        self.misses += 1
+        row = conn.execute(
+            f'SELECT {PRODUCT_COLUMNS} FROM products WHERE barcode=?', (barcode,)
+        ).fetchone()
+        if row is None:
+            return None
+        product = product_from_row(row)
+        with self._lock:
+            self._discard(product['id'])
+            self._store(product)
+            self._invalidate()
+        return product
+
+    def all_products(self, conn):
+        """Gibt alle Produkte nach Namen sortiert zurück"""
+        self.ensure_loaded(conn)
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self._by_id.values(), key=lambda p: p['name'])
+                self.misses += 1
+            else:
+                self.hits += 1
+            return self._sorted
+
+    def products_json(self, conn):
+        """
+        Gibt die serialisierte Produktliste und ihre Version zurück
+        Die JSON-Antwort wird bis zur nächsten Änderung wiederverwendet.
+        Liste, Text und Version entstehen unter einer Sperre, sonst könnte eine
+        alte Liste unter der Version einer gleichzeitigen Änderung landen.
+        """
+        with self._lock:
+            products = self.all_products(conn)
+            if self._body is None:
+                self._body = current_app.json.dumps(products)
+            return self._body, self.version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'loaded': self.loaded,
+            'version': self.version,
+            'products': len(self._by_id),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0
+        }
+
+    def _invalidate(self):
+        self._sorted = None
+        self._body = None
+
+    def _store(self, product):
+        self._by_id[product['id']] = product
+        if product['barcode']:
+            self._by_barcode[product['barcode']] = product
+
+    def _discard(self, product_id):
+        product = self._by_id.pop(product_id, None)
+        if product is not None and self._by_barcode.get(product['barcode']) is product:
+            del self._by_barcode[product['barcode']]
+
+
+catalog = ProductCatalog()
+
+
+def publish_product_changes(product_ids, event='product-changed'):
+    """
+    Meldet geänderte Produkte an die verbundenen Clients (siehe events.py)
+    Nach catalog.refresh aufrufen; die Daten kommen aus dem Katalog
+    :param event: 'product-changed' oder 'stock-changed'
+    """
+    products = []
+    deleted = []
+    for product_id in sorted(set(product_ids)):
+        product = catalog.get(product_id)
+        if product is None:
+            deleted.append(product_id)
+        else:
+            products.append(product)
+    broker.publish(event, {'version': catalog.version, 'products': products, 'deleted': deleted})
+
+
+def products_response(conn):
+    """
+    Antwort für GET /api/products mit Katalogversion als ETag
+    Stimmt If-None-Match überein, wird 304 ohne Inhalt gesendet
+    """
+    body, version = catalog.products_json(conn)
+    etag = f'catalog-{version}'
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['X-Catalog-Version'] = str(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def changes_since(conn, since):
+    """
+    Liefert alle Produktänderungen nach der angegebenen Katalogversion
+    :return: Dictionary mit version, products (neu/geändert) und deleted (IDs);
+             reset=True, wenn das Protokoll die Version nicht mehr abdeckt
+    """
+    # Alle Abfragen auf demselben Datenbank-Snapshot ausführen
+    conn.execute('BEGIN')
+    try:
+        version = read_version(conn)
+        oldest = conn.execute('SELECT MIN(version) FROM product_changes').fetchone()[0]
+        if since > version or (since < version and (oldest is None or since < oldest - 1)):
+            return {'version': version, 'reset': True}
+
+        rows = conn.execute(f'''
+            SELECT {PRODUCT_COLUMNS} FROM products
+            WHERE id IN (SELECT product_id FROM product_changes WHERE version > ?)
+            ORDER BY name
+        ''', (since,)).fetchall()
+        changed_ids = [
+            row[0] for row in conn.execute(
+                'SELECT DISTINCT product_id FROM product_changes WHERE version > ?', (since,)
+            )
+        ]
+    finally:
+        conn.commit()
+
+    products = [product_from_row(row) for row in rows]
+    existing = {product['id'] for product in products}
+    return {
+        'version': version,
+        'reset': False,
+        'products': products,
+        'deleted': [product_id for product_id in changed_ids if product_id not in existing]
+    }
+
+
+# Flask Integration
+def add_catalog_routes(app):
+    """
+    Fügt Katalog-Routen zur Flask App hinzu
+    """
+    @app.route('/api/catalog/stats')
+    def catalog_stats():
+        return {'catalog': catalog.stats()}
+
+    @app.route('/api/products/changes')
+    def product_changes():
+        since = request.args.get('since', type=int)
+        if since is None:
+            return {'error': 'Parameter since fehlt'}, 400
+        return changes_since(get_db(), since)
@@ -0,0 +1,284 @@
+"""
+Gemeinsame Datenbankschicht für das Kassensystem
+Hält langlebige SQLite-Verbindungen (WAL-Modus) in einem Pool vor,
+damit nicht jede Anfrage eine neue Verbindung aufbauen muss
+"""
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import metrics
+
+DB_PATH = os.environ.get('KASSENSYSTEM_DB', 'kassensystem.db')
+
+# Pragmas, die für jede neue Verbindung gesetzt werden
+PRAGMAS = [
+    ('journal_mode', 'WAL'),      # Leser blockieren Schreiber nicht mehr
+    ('synchronous', 'NORMAL'),    # Im WAL-Modus sicher und deutlich schneller
+    ('busy_timeout', 5000),       # Bis zu 5s auf Schreibsperre warten
+    ('cache_size', -16000),       # 16 MB Page-Cache pro Verbindung
+    ('temp_store', 'MEMORY'),
+]
+
+
+class ConnectionPool:
+    """
+    Pool langlebiger SQLite-Verbindungen
+    Jeder Thread bekommt über get() seine eigene Verbindung; release()
+    gibt sie zur Wiederverwendung an den Pool zurück
+    """
+
+    def __init__(self, path, max_idle=8):
+        """
+        :param path: Pfad zur SQLite Datenbank
+        :param max_idle: Maximale Anzahl ungenutzter Verbindungen im Pool
+        """
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+
+    def connect(self):
+        """Öffnet eine neue Verbindung mit den Pool-Pragmas"""
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               factory=metrics.connection_factory())
+        metrics.connection_opened()
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self):
+        """Holt eine freie Verbindung aus dem Pool oder öffnet eine neue"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release_connection(self, conn):
+        """Gibt eine Verbindung zurück; offene Transaktionen werden verworfen"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def get(self):
+        """Gibt die Verbindung des aktuellen Threads zurück"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.acquire()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Löst die Verbindung vom aktuellen Thread und legt sie in den Pool"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            self.release_connection(conn)
+
+    def close_all(self):
+        """Schließt alle ungenutzten Verbindungen"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+pool = ConnectionPool(DB_PATH)
+metrics.registry.gauge('kassensystem_db_idle_connections',
+                       'Ungenutzte Verbindungen im Pool', pool._idle.qsize)
+
+
+def get_db():
+    """Gibt die gepoolte Verbindung des aktuellen Threads zurück"""
+    return pool.get()
+
+
+def close_db(exception=None):
+    """Gibt die Verbindung des aktuellen Threads an den Pool zurück"""
+    pool.release()
+
+
+def init_app(app):
+    """
+    Bindet die Datenbankschicht an eine Flask App
+    Nach jeder Anfrage wandert die Verbindung zurück in den Pool
+    """
+    app.teardown_appcontext(close_db)
+
+
+# Zusätzliche Tabellen, die bei jedem Start angelegt werden
+TABLES = [
+    # Vorverdichtete Tageswerte je Zahlungsart (gepflegt von reports.py)
+    '''CREATE TABLE IF NOT EXISTS daily_payment_totals (
+        day TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        transaction_count INTEGER NOT NULL DEFAULT 0,
+        total_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, payment_method)
+    ) WITHOUT ROWID''',
+    # Vorverdichtete Tageswerte je Produkt
+    '''CREATE TABLE IF NOT EXISTS daily_product_totals (
+        day TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id)
+    ) WITHOUT ROWID''',
+    # Katalogversion für ETags der Produktliste (gepflegt von catalog.py)
+    '''CREATE TABLE IF NOT EXISTS catalog_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )''',
+    # Änderungsprotokoll des Katalogs für Delta-Sync (gepflegt von catalog.py)
+    '''CREATE TABLE IF NOT EXISTS product_changes (
+        version INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        operation TEXT NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version, product_id)
+    ) WITHOUT ROWID''',
+    # Druckwarteschlange für Belege (abgearbeitet von print_queue.py)
+    '''CREATE TABLE IF NOT EXISTS print_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        printed_at TIMESTAMP,
+        FOREIGN KEY (sale_id) REFERENCES sales (id)
+    )''',
+    # Beim Verkauf erzeugte ESC/POS Belege, zlib-komprimiert (siehe receipts.py)
+    '''CREATE TABLE IF NOT EXISTS receipts (
+        sale_id INTEGER PRIMARY KEY,
+        data BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sale_id) REFERENCES sales (id)
+    )''',
+    # Volltextindex über Name und Kategorie (gesucht von product_search.py),
+    # Inhalt kommt aus products und wird von TRIGGERS nachgeführt
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+        name, category,
+        content = 'products', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )''',
+    # Alle Begriffe des Index, für die Tippfehler-Korrektur
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab USING fts5vocab (products_fts, 'row')",
+]
+
+# Trigger, die products_fts bei jeder Änderung an products aktuell halten;
+# Bestandsbuchungen ändern nur stock und lassen den Index unberührt
+TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, category) VALUES (new.id, new.name, new.category);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, category ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO products_fts (rowid, name, category) VALUES (new.id, new.name, new.category);
+    END''',
+]
+
+# Spalten, die älteren Datenbanken per ALTER TABLE hinzugefügt werden,
+# jeweils mit optionalem Statement zum Nachtragen bestehender Zeilen
+COLUMNS = [
+    ('sales', 'printed', 'BOOLEAN DEFAULT 0', None),
+    # Vom Schreibpfad gepflegt, damit die Verkaufsliste sale_items nicht lesen muss
+    ('sales', 'item_count', 'INTEGER', '''
+        UPDATE sales SET item_count = (
+            SELECT COUNT(*) FROM sale_items si WHERE si.sale_id = sales.id
+        )
+    '''),
+    ('sales', 'total_quantity', 'INTEGER', '''
+        UPDATE sales SET total_quantity = (
+            SELECT COALESCE(SUM(si.quantity), 0) FROM sale_items si WHERE si.sale_id = sales.id
+        )
+    '''),
+    # Kennung offline erfasster Verkäufe, macht POST /api/sales/batch wiederholbar
+    ('sales', 'client_id', 'TEXT', None),
+    # Fehlt in älteren Datenbanken der Mobil-Demo
+    ('products', 'created_at', 'TIMESTAMP', 'UPDATE products SET created_at = CURRENT_TIMESTAMP'),
+]
+
+# Indizes, die bei jedem Start angelegt werden (auch für bestehende Datenbanken)
+INDEXES = [
+    # Positionen eines Verkaufs inkl. der für Berichte benötigten Spalten
+    'CREATE INDEX IF NOT EXISTS idx_sale_items_sale '
+    'ON sale_items (sale_id, product_id, quantity, total_price)',
+    'CREATE INDEX IF NOT EXISTS idx_sale_items_product '
+    'ON sale_items (product_id)',
+    # Blättern in der Verkaufsliste (neueste zuerst), optional gefiltert
+    'CREATE INDEX IF NOT EXISTS idx_sales_created_id '
+    'ON sales (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_sales_cashier '
+    'ON sales (cashier, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_sales_payment '
+    'ON sales (payment_method, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_print_jobs_status '
+    'ON print_jobs (status, next_attempt_at)',
+    'CREATE INDEX IF NOT EXISTS idx_daily_product_totals_quantity '
+    'ON daily_product_totals (day, quantity DESC)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_client_id '
+    'ON sales (client_id) WHERE client_id IS NOT NULL',
+]
+
+# Indizes, die nicht mehr gebraucht werden und nur den Schreibpfad bremsen
+DROPPED_INDEXES = [
+    # Tagesberichte lesen die vorverdichteten Tageswerte (siehe reports.py)
+    'idx_sales_created_payment',
+]
+
+
+def upgrade_schema(conn):
+    """
+    Bringt eine bestehende Datenbank auf den aktuellen Stand
+    Wird von init_db() nach dem Anlegen der Tabellen aufgerufen
+    """
+    existing_tables = {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+    for statement in TABLES + TRIGGERS:
+        conn.execute(statement)
+    if 'products_fts' not in existing_tables:
+        # Bestehende Produkte einmalig in den Suchindex übernehmen
+        conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    if 'daily_payment_totals' not in existing_tables:
+        # Bestehende Verkäufe einmalig in die Tageswerte übernehmen,
+        # sonst fehlen sie in den Tagesberichten
+        from reports import rebuild_rollups
+        rebuild_rollups(conn)
+    for table, column, definition, backfill in COLUMNS:
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            if backfill:
+                conn.execute(backfill)
+    # Indizes erst nach den Spalten, da sie neue Spalten abdecken können
+    for statement in INDEXES:
+        conn.execute(statement)
+    for index in DROPPED_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    conn.execute('INSERT OR IGNORE INTO catalog_state (id, version) VALUES (1, 0)')
+    conn.execute('PRAGMA optimize')
+
+
+def day_range(date):
+    """
+    Wandelt ein Datum (YYYY-MM-DD) in einen halboffenen Zeitraum um
+    Damit lässt sich created_at per Index filtern statt mit DATE(created_at)
+    :raises ValueError: bei ungültigem Datum
+    """
+    start = datetime.strptime(date, '%Y-%m-%d')
+    end = start + timedelta(days=1)
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
@@ -0,0 +1,85 @@
+"""
+ESC/POS Kommandos und Puffer für Belegdaten
+Belege werden direkt als Bytes im Arbeitsspeicher aufgebaut und ohne
+Umweg über eine Datei an den Drucker geschickt.
+"""
+import codecs
+from encodings import cp858
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@'  # ESC @ (Drucker zurücksetzen)
+CUT_COMMAND = GS + b'\x56\x00'  # GS V 0 (Vollschnitt)
+DRAWER_COMMAND = ESC + b'\x70\x00\x32\x96'  # ESC p 0 50 150 (Kassenschublade)
+
+# Codepage PC858 (wie PC850, zusätzlich mit €-Zeichen)
+CODEPAGE_COMMAND = ESC + b't\x13'  # ESC t 19
+
+# Schnelle Zeichentabelle; der Standard-Codec für cp858 nutzt ein langsames Dictionary
+_ENCODING_TABLE = codecs.charmap_build(cp858.decoding_table)
+
+ALIGN_LEFT = 0
+ALIGN_CENTER = 1
+ALIGN_RIGHT = 2
+
+
+def encode_text(text):
+    """Kodiert Text für den Drucker; nicht darstellbare Zeichen werden zu '?'"""
+    return codecs.charmap_encode(text, 'replace', _ENCODING_TABLE)[0]
+
+
+class EscPosBuffer:
+    """
+    Baut einen ESC/POS Druckjob im Arbeitsspeicher auf
+    Beginnt mit Drucker-Reset und Codepage-Auswahl, damit Umlaute und
+    das €-Zeichen korrekt gedruckt werden. Text wird gesammelt und erst vor
+    dem nächsten Kommando in einem Stück kodiert.
+    """
+
+    def __init__(self):
+        self._data = bytearray(INIT + CODEPAGE_COMMAND)
+        self._text = []
+
+    def raw(self, data):
+        """Hängt fertige ESC/POS Kommandos an"""
+        self._flush()
+        self._data += data
+        return self
+
+    def text(self, text):
+        self._text.append(text)
+        return self
+
+    def line(self, text=''):
+        self._text.append(text)
+        self._text.append('\n')
+        return self
+
+    def bold(self, on=True):
+        return self.raw(ESC + (b'E\x01' if on else b'E\x00'))
+
+    def double_height(self, on=True):
+        # GS ! n: Bit 0 = doppelte Höhe
+        return self.raw(GS + (b'!\x01' if on else b'!\x00'))
+
+    def align(self, alignment):
+        return self.raw(ESC + b'a' + bytes((alignment,)))
+
+    def feed(self, lines=1):
+        return self.raw(ESC + b'd' + bytes((lines,)))
+
+    def cut(self):
+        return self.raw(CUT_COMMAND)
+
+    def open_drawer(self):
+        return self.raw(DRAWER_COMMAND)
+
+    def getvalue(self):
+        self._flush()
+        return bytes(self._data)
+
+    def _flush(self):
+        if self._text:
+            self._data += encode_text(''.join(self._text))
+            self._text = []
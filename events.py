@@ -0,0 +1,123 @@
+"""
+Server-Sent Events für Kassen und Mobilgeräte
+Die Schreibpfade melden Änderungen an den EventBroker; jeder Client unter
+/api/events hat eine eigene Warteschlange. Clients, die nicht mitkommen,
+werden getrennt und holen verpasste Produktänderungen beim Neuverbinden
+über /api/products/changes nach.
+
+Ereignisse:
+    product-changed  Produkte angelegt, geändert oder gelöscht
+    stock-changed    Lagerbestand durch einen Verkauf geändert
+    sale-created     Neuer Verkauf
+    printer-status   Druckerstatus hat sich geändert (nur app_with_printer.py)
+"""
+import collections
+import json
+import queue
+import threading
+
+from flask import request
+
+# Höchstzahl gleichzeitiger Verbindungen pro Prozess
+MAX_SUBSCRIBERS = 100
+# Nicht abgeholte Ereignisse pro Client, danach wird er getrennt
+SUBSCRIBER_QUEUE_SIZE = 256
+# Kommentarzeile, damit Proxys und Browser die Verbindung offen halten
+HEARTBEAT_SECONDS = 15
+# So viele Ereignisse werden für Last-Event-ID beim Neuverbinden aufbewahrt
+REPLAY_BUFFER_SIZE = 500
+
+
+class EventBroker:
+    """
+    Verteilt Ereignisse an alle verbundenen Clients
+    Jedes Ereignis wird einmal formatiert und als fertiger Text verteilt
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = collections.deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._last_id = 0
+
+    def publish(self, event, data):
+        """Sendet ein Ereignis an alle verbundenen Clients"""
+        with self._lock:
+            self._last_id += 1
+            message = f'id: {self._last_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+            self._recent.append((self._last_id, message))
+            for subscriber in list(self._subscribers):
+                if subscriber.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+                    # Zu langsamer Client: trennen statt Speicher anzuhäufen
+                    # (der letzte Platz bleibt für die Abbruch-Markierung frei)
+                    self._subscribers.discard(subscriber)
+                    subscriber.put_nowait(None)
+                else:
+                    subscriber.put_nowait(message)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registriert einen Client
+        :param last_event_id: ID des zuletzt empfangenen Ereignisses; neuere
+                              Ereignisse aus dem Puffer werden nachgeliefert
+        :return: Warteschlange oder None, wenn zu viele Clients verbunden sind
+        """
+        subscriber = queue.Queue(SUBSCRIBER_QUEUE_SIZE + 1)
+        with self._lock:
+            if len(self._subscribers) >= MAX_SUBSCRIBERS:
+                return None
+            if last_event_id is not None:
+                for event_id, message in self._recent:
+                    if event_id > last_event_id and subscriber.qsize() < SUBSCRIBER_QUEUE_SIZE:
+                        subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'last_event_id': self._last_id}
+
+    def stream(self, subscriber):
+        """Erzeugt den Text-Strom für einen Client bis zur Trennung"""
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+broker = EventBroker()
+
+
+# Flask Integration
+def add_event_routes(app):
+    """
+    Fügt den Ereignis-Stream zur Flask App hinzu
+    """
+    @app.route('/api/events')
+    def events():
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        subscriber = broker.subscribe(last_event_id)
+        if subscriber is None:
+            return {'error': 'Zu viele verbundene Geräte'}, 503
+
+        response = app.response_class(broker.stream(subscriber), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    @app.route('/api/events/stats')
+    def events_stats():
+        return broker.stats()
@@ -0,0 +1,278 @@
+"""
+Laufzeit-Metriken im Prometheus-Textformat unter /api/metrics
+Erfasst werden Antwortzeiten je Route, Laufzeit und gelieferte Zeilen je
+SQL-Abfrage, geöffnete Datenbankverbindungen und Druckjob-Dauern.
+
+SQL-Abfragen werden nach der aufrufenden Funktion benannt
+(z.B. "sales.query_sales"), dadurch bleibt die Zahl der Zeitreihen klein und
+jede Abfrage ist im Code wiederzufinden. Die Zeit einer Abfrage ist die Zeit
+von execute() bis zur ersten Zeile.
+
+Die Messung kostet wenige Mikrosekunden pro Anfrage bzw. Abfrage und kann
+mit KASSENSYSTEM_METRICS=0 abgeschaltet werden.
+"""
+import bisect
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+METRICS_ENV = 'KASSENSYSTEM_METRICS'
+ENABLED = os.environ.get(METRICS_ENV, '1') != '0'
+
+# Obergrenzen der Histogramm-Klassen in Sekunden
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+PRINT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Name: (Typ, Beschreibung, Histogramm-Klassen)
+METRICS = {
+    'kassensystem_http_request_duration_seconds': (
+        'histogram', 'Antwortzeit je Route', REQUEST_BUCKETS),
+    'kassensystem_http_requests_total': (
+        'counter', 'Anfragen je Route und Statuscode', None),
+    'kassensystem_db_query_duration_seconds': (
+        'histogram', 'Laufzeit je SQL-Abfrage bis zur ersten Zeile', QUERY_BUCKETS),
+    'kassensystem_db_rows_total': (
+        'counter', 'Gelieferte Zeilen je SQL-Abfrage', None),
+    'kassensystem_db_connections_opened_total': (
+        'counter', 'Geöffnete SQLite-Verbindungen', None),
+    'kassensystem_printer_job_duration_seconds': (
+        'histogram', 'Dauer je Druckjob', PRINT_BUCKETS),
+}
+
+
+class Histogram:
+    """Zählt Messwerte in festen Klassen, wie ein Prometheus-Histogramm"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Alle Zeitreihen des Prozesses, Schlüssel ist (Name, Labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def increment(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, description, read):
+        """Registriert einen Wert, der erst beim Abruf gelesen wird"""
+        self._gauges[name] = (description, read)
+
+    def render(self):
+        """Gibt alle Zeitreihen im Prometheus-Textformat zurück"""
+        with self._lock:
+            histograms = {
+                key: (list(histogram.counts), histogram.sum, histogram.buckets)
+                for key, histogram in self._histograms.items()
+            }
+            counters = dict(self._counters)
+
+        lines = []
+        for name, (kind, description, _) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+                continue
+            for (metric, labels), (counts, total, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {total:.6f}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        for name, (description, read) in self._gauges.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {read()}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+registry = Registry()
+
+# Wird mit (Verbindung, Abfragename, SQL, Parameter, Sekunden) aufgerufen,
+# wenn eine Abfrage mindestens slow_query_seconds dauert (siehe slow_queries.py)
+slow_query_handler = None
+slow_query_seconds = 0.0
+
+# Abfragename je Code-Objekt der aufrufenden Funktion
+_query_names = {}
+
+
+def query_name(frame):
+    """Benennt eine Abfrage nach Modul und Funktion des Aufrufers"""
+    code = frame.f_code
+    name = _query_names.get(code)
+    if name is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        name = _query_names[code] = f'{module}.{code.co_name}'
+    return name
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor, der Laufzeit und gelieferte Zeilen je Abfrage erfasst"""
+
+    _query = None
+
+    def execute(self, sql, parameters=(), _frame=None):
+        self._query = (('query', query_name(_frame or sys._getframe(1))),)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters, _frame=None):
+        self._query = (('query', query_name(_frame or sys._getframe(1))),)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            # Die Parameter sind bereits verbraucht, falls es ein Generator war
+            self._observe(sql, None, time.perf_counter() - start)
+
+    def _observe(self, sql, parameters, seconds):
+        registry.observe('kassensystem_db_query_duration_seconds', self._query, seconds)
+        if slow_query_handler is not None and seconds >= slow_query_seconds:
+            slow_query_handler(self.connection, self._query[0][1], sql, parameters, seconds)
+
+    def _count(self, rows):
+        if rows and self._query is not None:
+            registry.increment('kassensystem_db_rows_total', self._query, rows)
+
+    def fetchone(self):
+        row = super().fetchone()
+        self._count(row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        # Beim Iterieren einmal am Ende zählen statt bei jeder Zeile
+        next_row = super().__next__
+        count = 0
+        try:
+            while True:
+                try:
+                    row = next_row()
+                except StopIteration:
+                    return
+                count += 1
+                yield row
+        finally:
+            self._count(count)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Verbindung, deren Cursor Abfragen erfassen (siehe InstrumentedCursor)"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters, sys._getframe(1))
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters, sys._getframe(1))
+
+
+def connection_factory():
+    """Klasse für sqlite3.connect: instrumentiert, außer die Metriken sind abgeschaltet"""
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+def connection_opened():
+    registry.increment('kassensystem_db_connections_opened_total')
+
+
+def observe_print_job(transport, seconds, success):
+    registry.observe('kassensystem_printer_job_duration_seconds',
+                     (('transport', transport), ('result', 'ok' if success else 'error')), seconds)
+
+
+# Flask Integration
+def add_metrics_routes(app):
+    """
+    Misst jede Anfrage und stellt /api/metrics bereit
+    Bei gestreamten Antworten (Export, Ereignisse) zählt die Zeit bis zum
+    Beginn der Antwort
+    """
+    from flask import g, request
+
+    if ENABLED:
+        @app.before_request
+        def start_timer():
+            g.metrics_start = time.perf_counter()
+
+        def record_request(start, status):
+            # Routen-Muster statt Pfad, damit /api/sales/<id> eine Zeitreihe bleibt
+            route = request.url_rule.rule if request.url_rule is not None else 'unbekannt'
+            labels = (('route', route), ('method', request.method))
+            registry.observe('kassensystem_http_request_duration_seconds', labels,
+                             time.perf_counter() - start)
+            registry.increment('kassensystem_http_requests_total', labels + (('status', status),))
+
+        @app.after_request
+        def record_response(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                record_request(start, response.status_code)
+            return response
+
+        @app.teardown_request
+        def record_unhandled_error(error):
+            # Bei durchgereichten Ausnahmen (Debug-Modus, Tests) läuft after_request
+            # nicht; die Anfrage zählt dann als 500
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                record_request(start, 500)
+
+    @app.route('/api/metrics')
+    def metrics():
+        return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -5,8 +5,22 @@ import json
 from datetime import datetime
 import os
 
+# Eigene Datenbank für die Demo, solange KASSENSYSTEM_DB nicht gesetzt ist
+os.environ.setdefault('KASSENSYSTEM_DB', 'mobile_kassensystem.db')
+
+from database import get_db, init_app, upgrade_schema
+from events import add_event_routes
+from metrics import add_metrics_routes
+from sales import add_sales_routes
+from slow_queries import add_slow_query_routes
+
 app = Flask(__name__)
 CORS(app)
+add_metrics_routes(app)
+add_slow_query_routes(app)
+init_app(app)
+add_event_routes(app)
+add_sales_routes(app)
 
 # Mobile-optimized HTML template
 MOBILE_TEMPLATE = """
@@ -335,6 +349,12 @@ MOBILE_TEMPLATE = """
             font-weight: bold;
             z-index: 1000;
         }
+
+        .sync-status {
+            margin-top: 8px;
+            font-size: 0.85rem;
+            color: #ff9800;
+        }
     </style>
 </head>
 <body>
@@ -344,6 +364,7 @@ MOBILE_TEMPLATE = """
         <div class="header">
             <h1><i class="fas fa-cash-register"></i> Kassensystem</h1>
             <div class="time" id="currentTime"></div>
+            <div class="sync-status" id="syncStatus"></div>
         </div>
         
         <!-- Produktsuche -->
@@ -402,16 +423,59 @@ MOBILE_TEMPLATE = """
         // Global variables
         let cart = [];
         let products = [];
+        let productsETag = null;
         let currentPaymentMethod = 'Bargeld';
+        let syncing = false;
+
+        // Höchstzahl Verkäufe pro Übertragung (MAX_BATCH_SIZE auf dem Server)
+        const SYNC_BATCH_SIZE = 1000;
 
         // Initialize app
-        document.addEventListener('DOMContentLoaded', function() {
-            loadProducts();
+        document.addEventListener('DOMContentLoaded', async function() {
             updateTime();
             setupEventListeners();
             setInterval(updateTime, 1000);
+
+            // Seite und Icons auch ohne Netz verfügbar halten
+            if ('serviceWorker' in navigator) {
+                navigator.serviceWorker.register('/sw.js').catch(error => {
+                    console.error('Service Worker nicht registriert:', error);
+                });
+            }
+
+            // Gespeicherte Produktliste sofort anzeigen, dann mit dem Server abgleichen
+            await loadCachedProducts();
+            loadProducts();
+            subscribeToEvents();
+
+            // Offline erfasste Verkäufe übertragen, sobald wieder Netz da ist
+            syncSales();
+            window.addEventListener('online', syncSales);
+            setInterval(syncSales, 30000);
         });
 
+        // Lokaler Speicher (IndexedDB): Produktkatalog und noch nicht übertragene Verkäufe
+        const localDb = new Promise((resolve, reject) => {
+            const open = indexedDB.open('mobile-kasse', 1);
+            open.onupgradeneeded = () => {
+                open.result.createObjectStore('catalog');
+                open.result.createObjectStore('outbox', { keyPath: 'client_id' });
+            };
+            open.onsuccess = () => resolve(open.result);
+            open.onerror = () => reject(open.error);
+        });
+
+        // Führt action in einer Transaktion auf storeName aus, liefert das Ergebnis der Anfrage
+        async function localStore(storeName, mode, action) {
+            const db = await localDb;
+            return new Promise((resolve, reject) => {
+                const tx = db.transaction(storeName, mode);
+                const request = action(tx.objectStore(storeName));
+                tx.oncomplete = () => resolve(request ? request.result : undefined);
+                tx.onerror = () => reject(tx.error);
+            });
+        }
+
         // Update current time
         function updateTime() {
             const now = new Date();
@@ -436,26 +500,78 @@ MOBILE_TEMPLATE = """
         // Load products
         async function loadProducts() {
             try {
-                const response = await fetch('/api/products');
+                // Katalogversion mitschicken: 304 = Produktliste unverändert
+                const headers = productsETag ? { 'If-None-Match': productsETag } : {};
+                const response = await fetch('/api/products', { headers, cache: 'no-store' });
+                if (response.status === 304) return;
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
                 const data = await response.json();
                 products = data;
+                productsETag = response.headers.get('ETag');
                 displayQuickProducts();
+                saveCatalog();
             } catch (error) {
                 console.error('Error loading products:', error);
-                showNotification('Demo-Modus: Beispielprodukte werden geladen', 'info');
-                // Fallback demo products
-                products = [
-                    {id: 1, name: 'Apfel', price: 0.50, barcode: '1111'},
-                    {id: 2, name: 'Banane', price: 0.30, barcode: '2222'},
-                    {id: 3, name: 'Brot', price: 2.50, barcode: '3333'},
-                    {id: 4, name: 'Milch', price: 1.20, barcode: '4444'},
-                    {id: 5, name: 'Cola', price: 1.50, barcode: '5555'},
-                    {id: 6, name: 'Chips', price: 1.99, barcode: '6666'}
-                ];
+                if (products.length > 0) {
+                    showNotification('Offline: gespeicherte Produktliste wird verwendet', 'info');
+                } else {
+                    showNotification('Offline: noch keine Produktliste gespeichert', 'error');
+                }
+            }
+        }
+
+        // Zuletzt geladene Produktliste aus IndexedDB
+        async function loadCachedProducts() {
+            try {
+                const cached = await localStore('catalog', 'readonly', store => store.get('products'));
+                if (!cached) return;
+                products = cached.products;
+                // Passt zur gespeicherten Liste: Server antwortet mit 304, wenn nichts neu ist
+                productsETag = cached.etag;
                 displayQuickProducts();
+            } catch (error) {
+                console.error('Error reading cached products:', error);
             }
         }
 
+        // Produktliste für den Offline-Betrieb sichern
+        function saveCatalog() {
+            localStore('catalog', 'readwrite', store => store.put({ products, etag: productsETag }, 'products'))
+                .catch(error => console.error('Error caching products:', error));
+        }
+
+        // Live-Updates vom Server (Server-Sent Events)
+        function subscribeToEvents() {
+            if (!window.EventSource) return;
+            const source = new EventSource('/api/events');
+            
+            const onProductEvent = event => {
+                const changes = JSON.parse(event.data);
+                const deleted = new Set(changes.deleted);
+                const changed = new Map(changes.products.map(product => [product.id, product]));
+                products = products.filter(product => !deleted.has(product.id) && !changed.has(product.id));
+                products.push(...changed.values());
+                products.sort((a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0));
+                // Gespeicherte Liste ist veraltet, ETag nicht mehr mitschicken
+                productsETag = null;
+                displayQuickProducts();
+                saveCatalog();
+            };
+            source.addEventListener('product-changed', onProductEvent);
+            source.addEventListener('stock-changed', onProductEvent);
+            
+            // Nach einem Verbindungsabbruch die Produktliste einmal abgleichen
+            let connected = false;
+            source.addEventListener('open', () => {
+                if (connected) {
+                    loadProducts();
+                    syncSales();
+                }
+                connected = true;
+            });
+        }
+
         // Display quick products
         function displayQuickProducts() {
             const container = document.getElementById('quickProducts');
@@ -595,14 +711,98 @@ MOBILE_TEMPLATE = """
             if (cart.length === 0) return;
             
             const total = cart.reduce((sum, item) => sum + item.total_price, 0);
-            
+
+            // Verkauf zuerst lokal sichern; die Übertragung läuft im Hintergrund
+            const sale = {
+                client_id: newClientId(),
+                created_at: new Date().toISOString().slice(0, 19).replace('T', ' '),
+                total_amount: total,
+                payment_method: currentPaymentMethod,
+                cashier: 'Mobil',
+                items: cart.map(item => ({
+                    product_id: item.product_id,
+                    quantity: item.quantity,
+                    unit_price: item.unit_price,
+                    total_price: item.total_price
+                }))
+            };
+            try {
+                await localStore('outbox', 'readwrite', store => store.put(sale));
+            } catch (error) {
+                console.error('Error storing sale:', error);
+                showNotification('Verkauf konnte nicht gespeichert werden', 'error');
+                return;
+            }
+
             showNotification(`Verkauf abgeschlossen! Gesamt: ${formatPrice(total)} (${currentPaymentMethod})`, 'success');
-            
-            // In demo mode, just clear cart
-            setTimeout(() => {
-                clearCart();
-                selectPaymentMethod('Bargeld');
-            }, 1500);
+            cart = [];
+            updateCartDisplay();
+            selectPaymentMethod('Bargeld');
+            syncSales();
+        }
+
+        // Eindeutige Kennung pro Verkauf, damit der Server doppelte Übertragungen erkennt
+        function newClientId() {
+            if (crypto.randomUUID) return crypto.randomUUID();
+            // randomUUID fehlt ohne HTTPS
+            const bytes = crypto.getRandomValues(new Uint8Array(16));
+            return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+        }
+
+        // Offene Verkäufe in einem Aufruf an POST /api/sales/batch übertragen
+        async function syncSales() {
+            if (syncing) return;
+            syncing = true;
+            try {
+                const stored = await localStore('outbox', 'readonly', store => store.getAll());
+                const pending = stored.filter(sale => !sale.rejected);
+                for (let start = 0; start < pending.length; start += SYNC_BATCH_SIZE) {
+                    const response = await fetch('/api/sales/batch', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ sales: pending.slice(start, start + SYNC_BATCH_SIZE) })
+                    });
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    const result = await response.json();
+
+                    // Gebuchte und bereits bekannte Verkäufe entfernen; abgewiesene
+                    // bleiben mit Fehlermeldung liegen und werden nicht erneut gesendet
+                    const rejected = result.results.filter(r => r.status === 'rejected');
+                    await localStore('outbox', 'readwrite', store => {
+                        result.results.forEach(r => {
+                            if (r.status !== 'rejected') store.delete(r.client_id);
+                        });
+                        rejected.forEach(r => {
+                            const sale = pending.find(s => s.client_id === r.client_id);
+                            if (sale) store.put({ ...sale, rejected: r.error });
+                        });
+                    });
+                    if (rejected.length > 0) {
+                        showNotification(`${rejected.length} Verkauf/Verkäufe abgewiesen: ${rejected[0].error}`, 'error');
+                    }
+                }
+            } catch (error) {
+                // Offline oder Server nicht erreichbar: beim nächsten Versuch erneut senden
+                console.error('Error syncing sales:', error);
+            } finally {
+                syncing = false;
+                updateSyncStatus();
+            }
+        }
+
+        // Anzahl noch nicht übertragener Verkäufe anzeigen
+        async function updateSyncStatus() {
+            try {
+                const stored = await localStore('outbox', 'readonly', store => store.getAll());
+                const pending = stored.filter(sale => !sale.rejected).length;
+                const rejected = stored.length - pending;
+                const parts = [];
+                if (pending > 0) parts.push(`${pending} Verkauf/Verkäufe nicht übertragen`);
+                if (rejected > 0) parts.push(`${rejected} abgewiesen`);
+                document.getElementById('syncStatus').textContent = parts.join(' · ');
+            } catch (error) {
+                console.error('Error reading outbox:', error);
+            }
         }
 
         // Format price
@@ -631,9 +831,47 @@ MOBILE_TEMPLATE = """
 </html>
 """
 
+# Service Worker: liefert Seite und Icons aus dem Cache, wenn kein Netz da ist.
+# Produktliste und offene Verkäufe liegen in IndexedDB, /api/ geht immer ans Netz.
+SERVICE_WORKER = """
+const CACHE = 'mobile-kasse-v1';
+
+self.addEventListener('install', event => {
+    event.waitUntil(caches.open(CACHE).then(cache => cache.add('/')).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== CACHE).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET') return;
+    if (url.origin === location.origin && url.pathname.startsWith('/api/')) return;
+
+    // Erst das Netz fragen, damit Änderungen an der Seite sofort ankommen
+    event.respondWith(
+        fetch(request)
+            .then(response => {
+                if (response.ok || response.type === 'opaque') {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(cache => cache.put(request, copy));
+                }
+                return response;
+            })
+            .catch(() => caches.match(request))
+    );
+});
+"""
+
 # Database setup (same as main app)
 def init_db():
-    conn = sqlite3.connect('mobile_kassensystem.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -643,7 +881,32 @@ def init_db():
             price REAL NOT NULL,
             category TEXT,
             barcode TEXT UNIQUE,
-            stock INTEGER DEFAULT 0
+            stock INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Verkäufe, die die Mobilkasse über /api/sales/batch überträgt
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            total_amount REAL NOT NULL,
+            payment_method TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            cashier TEXT DEFAULT 'System'
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
         )
     ''')
     
@@ -663,18 +926,23 @@ def init_db():
             sample_products
         )
     
+    upgrade_schema(conn)
     conn.commit()
-    conn.close()
 
 @app.route('/')
 def mobile_app():
     return render_template_string(MOBILE_TEMPLATE)
 
+@app.route('/sw.js')
+def service_worker():
+    response = app.response_class(SERVICE_WORKER, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    conn = sqlite3.connect('mobile_kassensystem.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products ORDER BY name')
+    cursor = get_db().cursor()
+    cursor.execute('SELECT id, name, price, category, barcode, stock FROM products ORDER BY name')
     products = []
     for row in cursor.fetchall():
         products.append({
@@ -685,8 +953,12 @@ def get_products():
             'barcode': row[4],
             'stock': row[5]
         })
-    conn.close()
-    return jsonify(products)
+    
+    # ETag aus dem Inhalt: bei unveränderter Liste antwortet der Server mit 304
+    response = jsonify(products)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
     init_db()
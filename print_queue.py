@@ -0,0 +1,212 @@
+"""
+Persistente Druckwarteschlange für Kassenbelege
+create_sale legt nur einen Eintrag in print_jobs an; ein Hintergrund-Thread
+arbeitet die Warteschlange ab, wiederholt fehlgeschlagene Drucke mit
+wachsender Wartezeit und setzt danach sales.printed
+"""
+import threading
+import time
+
+from database import get_db
+
+
+class PrintQueue:
+    """
+    Arbeitet die Tabelle print_jobs in einem Hintergrund-Thread ab
+    """
+
+    def __init__(self, handler, max_attempts=5, base_delay=2.0, max_delay=300.0, poll_interval=5.0):
+        """
+        :param handler: Funktion(sale_id, attempts) -> {'success': bool, 'error': str};
+            attempts ist die Zahl der vorherigen Versuche, 0 beim ersten Druck
+        :param max_attempts: Versuche, bevor ein Auftrag als fehlgeschlagen gilt
+        :param base_delay: Wartezeit nach dem ersten Fehlversuch in Sekunden
+        :param max_delay: Obergrenze für die Wartezeit zwischen Versuchen
+        :param poll_interval: Spätestens so oft wird die Tabelle geprüft
+        """
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def enqueue(conn, sale_id):
+        """
+        Legt einen Druckauftrag an
+        Wird innerhalb der Transaktion des Verkaufs aufgerufen
+        """
+        cursor = conn.execute('INSERT INTO print_jobs (sale_id) VALUES (?)', (sale_id,))
+        return cursor.lastrowid
+
+    def notify(self):
+        """Weckt den Hintergrund-Thread nach einem Commit auf"""
+        self._wakeup.set()
+
+    def start(self):
+        """Startet den Hintergrund-Thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        conn = get_db()
+        # Nach einem Absturz hängengebliebene Aufträge wieder freigeben
+        conn.execute("UPDATE print_jobs SET status = 'pending' WHERE status = 'printing'")
+        conn.commit()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='print-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                job = self._claim_next_job()
+            except Exception as e:
+                print(f"Druckwarteschlange: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self._seconds_until_next_job())
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                # z.B. "database is locked", wenn ein Import die Schreibsperre hält
+                print(f"Druckwarteschlange: Auftrag {job['id']}: {e}")
+                self._release(job)
+
+    def _claim_next_job(self):
+        """Reserviert den ältesten fälligen Auftrag"""
+        conn = get_db()
+        row = conn.execute('''
+            SELECT id, sale_id, attempts FROM print_jobs
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT 1
+        ''', (time.time(),)).fetchone()
+        if row is None:
+            return None
+        # Der Versuch zählt schon beim Reservieren: bricht der Druck durch einen
+        # Absturz ab, ist der nächste Versuch nicht mehr der erste
+        cursor = conn.execute('''
+            UPDATE print_jobs SET status = 'printing', attempts = attempts + 1
+            WHERE id = ? AND status = 'pending'
+        ''', (row['id'],))
+        conn.commit()
+        # Ein anderer Prozess war schneller
+        return row if cursor.rowcount == 1 else None
+
+    def _release(self, job):
+        """Gibt einen Auftrag nach einem Fehler wieder frei, statt ihn auf 'printing' zu lassen"""
+        try:
+            conn = get_db()
+            conn.rollback()
+            conn.execute(
+                "UPDATE print_jobs SET status = 'pending' WHERE id = ? AND status = 'printing'",
+                (job['id'],)
+            )
+            conn.commit()
+        except Exception as e:
+            # Bleibt liegen, bis start() hängengebliebene Aufträge freigibt
+            print(f"Druckwarteschlange: Auftrag {job['id']}: {e}")
+
+    def _seconds_until_next_job(self):
+        try:
+            row = get_db().execute(
+                "SELECT MIN(next_attempt_at) FROM print_jobs WHERE status = 'pending'"
+            ).fetchone()
+        except Exception:
+            return self.poll_interval
+        if row[0] is None:
+            return self.poll_interval
+        return min(max(row[0] - time.time(), 0), self.poll_interval)
+
+    def _process(self, job):
+        try:
+            result = self.handler(job['sale_id'], job['attempts'])
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        conn = get_db()
+        attempts = job['attempts'] + 1
+        if result.get('success'):
+            conn.execute('''
+                UPDATE print_jobs
+                SET status = 'done', attempts = ?, last_error = NULL, printed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (attempts, job['id']))
+            conn.execute('UPDATE sales SET printed = 1 WHERE id = ?', (job['sale_id'],))
+        elif attempts >= self.max_attempts:
+            conn.execute('''
+                UPDATE print_jobs SET status = 'failed', attempts = ?, last_error = ?
+                WHERE id = ?
+            ''', (attempts, result.get('error'), job['id']))
+        else:
+            delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+            conn.execute('''
+                UPDATE print_jobs SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+            ''', (attempts, result.get('error'), time.time() + delay, job['id']))
+        conn.commit()
+
+    def stats(self, conn, failure_limit=20):
+        """Gibt Warteschlangenlänge und die letzten Fehlschläge zurück"""
+        counts = {'pending': 0, 'printing': 0, 'done': 0, 'failed': 0}
+        for row in conn.execute('SELECT status, COUNT(*) FROM print_jobs GROUP BY status'):
+            counts[row[0]] = row[1]
+
+        oldest = conn.execute(
+            "SELECT MIN(created_at) FROM print_jobs WHERE status IN ('pending', 'printing')"
+        ).fetchone()[0]
+
+        failures = []
+        for row in conn.execute('''
+            SELECT id, sale_id, status, attempts, last_error, created_at FROM print_jobs
+            WHERE last_error IS NOT NULL AND status != 'done'
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (failure_limit,)):
+            failures.append({
+                'id': row['id'],
+                'sale_id': row['sale_id'],
+                'status': row['status'],
+                'attempts': row['attempts'],
+                'error': row['last_error'],
+                'created_at': row['created_at']
+            })
+
+        return {
+            'queue_depth': counts['pending'] + counts['printing'],
+            'counts': counts,
+            'oldest_pending_at': oldest,
+            'worker_running': self._thread is not None and self._thread.is_alive(),
+            'failures': failures
+        }
+
+
+# Flask Integration
+def add_print_queue_routes(app, print_queue):
+    """
+    Fügt Routen für die Druckwarteschlange zur Flask App hinzu
+    """
+    @app.route('/api/print-jobs')
+    def print_jobs():
+        return print_queue.stats(get_db())
+
+    @app.route('/api/print-jobs/<int:job_id>/retry', methods=['POST'])
+    def retry_print_job(job_id):
+        conn = get_db()
+        cursor = conn.execute('''
+            UPDATE print_jobs SET status = 'pending', attempts = 0, next_attempt_at = 0
+            WHERE id = ? AND status = 'failed'
+        ''', (job_id,))
+        conn.commit()
+        print_queue.notify()
+        return {'success': cursor.rowcount == 1}
@@ -1,92 +1,84 @@
-import win32print
-import win32ui
-import win32con
-import win32gui
-from datetime import datetime
-import tempfile
-import os
+from datetime import datetime, timezone
+import threading
+import time
 
-class EpsonTMT88VPrinter:
+import metrics
+from escpos import ALIGN_CENTER, ALIGN_LEFT, CUT_COMMAND, DRAWER_COMMAND, EscPosBuffer
+from printer_transports import Win32Transport, create_transport
+
+# Daten für die Testseite
+TEST_RECEIPT = {
+    'sale_id': 'TEST-001',
+    'cashier': 'System Test',
+    'payment_method': 'Bargeld',
+    'received_amount': 10.00,
+    'items': [
+        {
+            'name': 'Test Artikel 1',
+            'quantity': 2,
+            'unit_price': 1.50,
+            'total_price': 3.00
+        },
+        {
+            'name': 'Test Artikel 2',
+            'quantity': 1,
+            'unit_price': 2.99,
+            'total_price': 2.99
+        }
+    ]
+}
+
+
+class ReceiptFormatter:
     """
-    Windows Printer Support für Epson TMT88V Thermodrucker
-    Unterstützt ESC/POS Kommandos für optimale Belegdrucke
+    Erzeugt Belege als ESC/POS Bytes
+    Unabhängig vom Drucker, damit Belege schon beim Verkauf erzeugt werden können
     """
     
-    def __init__(self, printer_name=None):
-        """
-        Initialisiert den Drucker
-        :param printer_name: Name des Druckers (None = Standarddrucker)
-        """
-        self.printer_name = printer_name or self.get_default_printer()
-        self.width_chars = 48  # Standard Zeichen pro Zeile für TMT88V
-        
-    def get_default_printer(self):
-        """Gibt den Standarddrucker zurück"""
-        try:
-            return win32print.GetDefaultPrinter()
-        except:
-            # Fallback: Ersten verfügbaren Drucker nehmen
-            printers = self.list_printers()
-            return printers[0] if printers else None
+    width_chars = 48  # Standard Zeichen pro Zeile für TMT88V
     
-    def list_printers(self):
-        """Listet alle verfügbaren Drucker auf"""
-        printers = []
-        for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL):
-            printers.append(printer[2])
-        return printers
-    
-    def find_epson_printer(self):
-        """Sucht automatisch nach Epson TMT88V Drucker"""
-        printers = self.list_printers()
-        epson_keywords = ['epson', 'tmt88', 'tm-t88', 'thermal', 'receipt']
-        
-        for printer in printers:
-            printer_lower = printer.lower()
-            if any(keyword in printer_lower for keyword in epson_keywords):
-                return printer
-        return None
-    
-    def print_receipt(self, sale_data):
+    def format_sale_time(self, created_at):
         """
-        Druckt einen Beleg mit ESC/POS Formatierung
-        :param sale_data: Dictionary mit Verkaufsdaten
+        Formatiert den Verkaufszeitpunkt in Ortszeit
+        :param created_at: created_at aus sales (UTC, "YYYY-MM-DD HH:MM:SS");
+                           fehlt er, gilt die aktuelle Zeit (neuer Verkauf)
         """
-        try:
-            # ESC/POS Beleg erstellen
-            receipt_text = self.format_receipt(sale_data)
-            
-            # Über Windows Druckerspooler drucken
-            self.print_text(receipt_text)
-            
-            return {'success': True, 'message': 'Beleg erfolgreich gedruckt'}
-            
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        if not created_at:
+            sale_time = datetime.now()
+        else:
+            try:
+                sale_time = datetime.fromisoformat(str(created_at)).replace(tzinfo=timezone.utc).astimezone()
+            except ValueError:
+                return str(created_at)
+        return sale_time.strftime('%d.%m.%Y %H:%M:%S')
     
-    def format_receipt(self, sale_data):
+    def format_receipt(self, sale_data, cut=False):
         """
         Formatiert den Beleg im ESC/POS Format
+        :param cut: Schnitt-Kommando anhängen
+        :return: Bytes für den Drucker
         """
-        lines = []
+        buf = EscPosBuffer()
+        rule = "=" * self.width_chars
         
         # Header mit Logo/Firmenname
-        lines.append(self.center_text("=" * 48))
-        lines.append(self.center_text("KASSENSYSTEM"))
-        lines.append(self.center_text("Ihr Geschäft"))
-        lines.append(self.center_text("=" * 48))
-        lines.append("")
+        buf.align(ALIGN_CENTER)
+        buf.line(rule)
+        buf.bold().double_height().line("KASSENSYSTEM").double_height(False).bold(False)
+        buf.line("Ihr Geschäft")
+        buf.line(rule)
+        buf.align(ALIGN_LEFT)
+        buf.line()
         
         # Verkaufsinformationen
-        now = datetime.now()
-        lines.append(f"Datum: {now.strftime('%d.%m.%Y %H:%M:%S')}")
-        lines.append(f"Beleg-Nr: {sale_data.get('sale_id', 'N/A')}")
-        lines.append(f"Kassierer: {sale_data.get('cashier', 'System')}")
-        lines.append("-" * 48)
+        buf.line(f"Datum: {self.format_sale_time(sale_data.get('created_at'))}")
+        buf.line(f"Beleg-Nr: {sale_data.get('sale_id', 'N/A')}")
+        buf.line(f"Kassierer: {sale_data.get('cashier', 'System')}")
+        buf.line("-" * self.width_chars)
         
         # Artikel
-        lines.append("ARTIKEL")
-        lines.append("-" * 48)
+        buf.bold().line("ARTIKEL").bold(False)
+        buf.line("-" * self.width_chars)
         
         total = 0
         for item in sale_data.get('items', []):
@@ -96,85 +88,178 @@ class EpsonTMT88VPrinter:
             total_price = item.get('total_price', 0)
             
             # Artikelzeile
-            lines.append(f"{name[:30]:<30}")
-            lines.append(f"  {qty} x {self.format_price(price)} = {self.format_price(total_price):>12}")
+            buf.line(f"{name[:30]:<30}")
+            buf.line(f"  {qty} x {self.format_price(price)} = {self.format_price(total_price):>12}")
             
             total += total_price
         
-        lines.append("-" * 48)
+        buf.line("-" * self.width_chars)
         
         # Summe
-        lines.append(f"{'GESAMT:':>36} {self.format_price(total):>10}")
-        lines.append("")
+        buf.bold().double_height()
+        buf.line(f"{'GESAMT:':>36} {self.format_price(total):>10}")
+        buf.double_height(False).bold(False)
+        buf.line()
         
         # Zahlungsinformation
         payment_method = sale_data.get('payment_method', 'Bargeld')
-        lines.append(f"Zahlungsart: {payment_method}")
+        buf.line(f"Zahlungsart: {payment_method}")
         
         if payment_method == 'Bargeld':
             received = sale_data.get('received_amount', total)
             change = received - total
-            lines.append(f"Erhalten:    {self.format_price(received):>10}")
+            buf.line(f"Erhalten:    {self.format_price(received):>10}")
             if change > 0:
-                lines.append(f"Rückgeld:    {self.format_price(change):>10}")
+                buf.line(f"Rückgeld:    {self.format_price(change):>10}")
         
-        lines.append("")
-        lines.append(self.center_text("Vielen Dank für Ihren Einkauf!"))
-        lines.append(self.center_text("Beleg bitte aufbewahren"))
-        lines.append("")
+        buf.line()
+        buf.align(ALIGN_CENTER)
+        buf.line("Vielen Dank für Ihren Einkauf!")
+        buf.line("Beleg bitte aufbewahren")
+        buf.line()
         
         # MwSt Hinweis
-        lines.append(self.center_text("Alle Preise inkl. 19% MwSt"))
-        lines.append("")
+        buf.line("Alle Preise inkl. 19% MwSt")
+        buf.line()
         
         # Footer
-        lines.append(self.center_text("=" * 48))
+        buf.line(rule)
+        buf.align(ALIGN_LEFT)
         
         # Papier vorschub
-        lines.extend(["", "", "", ""])
+        buf.feed(4)
+        if cut:
+            buf.cut()
         
-        return "\n".join(lines)
+        return buf.getvalue()
     
-    def print_text(self, text):
+    def center_text(self, text):
+        """Zentriert Text für den Drucker"""
+        if len(text) >= self.width_chars:
+            return text
+        padding = (self.width_chars - len(text)) // 2
+        return " " * padding + text
+    
+    def format_price(self, price):
+        """Formatiert Preise"""
+        return f"{price:.2f}€"
+
+
+class EpsonTMT88VPrinter(ReceiptFormatter):
+    """
+    Belegdrucker-Support für Epson TMT88V Thermodrucker
+    Unterstützt ESC/POS Kommandos für optimale Belegdrucke
+    Die Daten gehen über einen Transport aus printer_transports an den Drucker
+    """
+    
+    def __init__(self, printer_name=None, transport=None):
         """
-        Druckt Text über Windows Druckerspooler
+        Initialisiert den Drucker
+        :param printer_name: Druckerangabe, siehe printer_transports
+                             (None = KASSENSYSTEM_PRINTER bzw. Standarddrucker)
+        :param transport: bereits erzeugter Transport (ersetzt printer_name)
+        """
+        self.transport = transport or create_transport(printer_name)
+    
+    @property
+    def printer_name(self):
+        return self.transport.name
+    
+    def open(self):
+        """
+        Öffnet die Verbindung zum Drucker dauerhaft
+        Alle folgenden Druckjobs verwenden dieselbe Verbindung bis close()
+        """
+        self.transport.open()
+    
+    def close(self):
+        """Schließt eine mit open() geöffnete Verbindung"""
+        self.transport.close()
+    
+    def write_job(self, data, job_name, datatype=None):
+        """
+        Sendet Bytes als einen Druckjob an den Drucker
+        :raises Exception: bei Druckfehlern
         """
-        # Temporäre Datei erstellen
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-            f.write(text)
-            temp_file = f.name
+        start = time.perf_counter()
+        success = False
+        try:
+            self.transport.write(data, job_name, datatype)
+            success = True
+        finally:
+            metrics.observe_print_job(type(self.transport).__name__,
+                                      time.perf_counter() - start, success)
+    
+    def list_printers(self):
+        """Listet alle verfügbaren Drucker auf"""
+        printers = Win32Transport.list_printers()
+        if self.printer_name and self.printer_name not in printers:
+            printers.append(self.printer_name)
+        return printers
+    
+    def find_epson_printer(self):
+        """Sucht automatisch nach Epson TMT88V Drucker"""
+        printers = self.list_printers()
+        epson_keywords = ['epson', 'tmt88', 'tm-t88', 'thermal', 'receipt']
         
+        for printer in printers:
+            printer_lower = printer.lower()
+            if any(keyword in printer_lower for keyword in epson_keywords):
+                return printer
+        return None
+    
+    def print_receipt(self, sale_data, cut=False, open_drawer=False):
+        """
+        Druckt einen Beleg mit ESC/POS Formatierung
+        :param sale_data: Dictionary mit Verkaufsdaten
+        :param cut: Papier nach dem Beleg abschneiden
+        :param open_drawer: Kassenschublade im selben Job öffnen
+        """
         try:
-            # Drucker öffnen
-            hprinter = win32print.OpenPrinter(self.printer_name)
+            # ESC/POS Beleg im Speicher erstellen und direkt senden
+            self.print_job(sale_data, cut=cut, open_drawer=open_drawer)
             
-            try:
-                # Druckjob starten
-                job_info = ("Kassensystem Beleg", None, "")
-                job_id = win32print.StartDocPrinter(hprinter, 1, job_info)
-                
-                try:
-                    win32print.StartPagePrinter(hprinter)
-                    
-                    # Text als Raw Data senden (für Thermodrucker optimal)
-                    with open(temp_file, 'rb') as f:
-                        data = f.read()
-                    
-                    win32print.WritePrinter(hprinter, data)
-                    win32print.EndPagePrinter(hprinter)
-                    
-                finally:
-                    win32print.EndDocPrinter(hprinter)
-                    
-            finally:
-                win32print.ClosePrinter(hprinter)
-                
-        finally:
-            # Temporäre Datei löschen
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+            return {'success': True, 'message': 'Beleg erfolgreich gedruckt'}
+            
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def compose_job(self, sale_data=None, cut=False, open_drawer=False, rendered=None):
+        """
+        Setzt Beleg, Papierschnitt und Kassenschublade zu einem Datenstrom zusammen
+        :param sale_data: Verkaufsdaten für den Beleg (None = kein Beleg)
+        :param rendered: bereits erzeugter Beleg, z.B. aus receipts (statt sale_data)
+        :return: Bytes für einen einzigen Druckjob
+        """
+        parts = []
+        if rendered is not None:
+            parts.append(rendered)
+            if cut:
+                parts.append(CUT_COMMAND)
+        elif sale_data is not None:
+            parts.append(self.format_receipt(sale_data, cut))
+        elif cut:
+            parts.append(CUT_COMMAND)
+        if open_drawer:
+            parts.append(DRAWER_COMMAND)
+        return b''.join(parts)
+    
+    def print_job(self, sale_data=None, cut=False, open_drawer=False, rendered=None):
+        """
+        Sendet Beleg, Schnitt und Schubladenimpuls als einen Druckjob
+        :raises Exception: bei Druckfehlern
+        """
+        if sale_data is not None or rendered is not None:
+            job_name = "Kassensystem Beleg"
+        else:
+            job_name = "ESC/POS Commands"
+        self.write_job(self.compose_job(sale_data, cut, open_drawer, rendered), job_name, "RAW")
+    
+    def print_text(self, text):
+        """
+        Druckt unformatierten Text
+        """
+        self.write_job(EscPosBuffer().line(text).getvalue(), "Kassensystem Beleg", "RAW")
     
     def print_raw_escpos(self, commands):
         """
@@ -182,23 +267,7 @@ class EpsonTMT88VPrinter:
         :param commands: Bytes mit ESC/POS Kommandos
         """
         try:
-            hprinter = win32print.OpenPrinter(self.printer_name)
-            
-            try:
-                job_info = ("ESC/POS Commands", None, "RAW")
-                job_id = win32print.StartDocPrinter(hprinter, 1, job_info)
-                
-                try:
-                    win32print.StartPagePrinter(hprinter)
-                    win32print.WritePrinter(hprinter, commands)
-                    win32print.EndPagePrinter(hprinter)
-                    
-                finally:
-                    win32print.EndDocPrinter(hprinter)
-                    
-            finally:
-                win32print.ClosePrinter(hprinter)
-                
+            self.write_job(commands, "ESC/POS Commands", "RAW")
             return True
             
         except Exception as e:
@@ -207,66 +276,29 @@ class EpsonTMT88VPrinter:
     
     def cut_paper(self):
         """Schneidet das Papier"""
-        # ESC/POS Kommando für Papier schneiden
-        cut_command = b'\x1d\x56\x00'  # GS V 0 (Vollschnitt)
-        return self.print_raw_escpos(cut_command)
+        return self.try_print_job(cut=True)
     
     def open_cash_drawer(self):
         """Öffnet die Kassenschublade"""
-        # ESC/POS Kommando für Kassenschublade
-        drawer_command = b'\x1b\x70\x00\x32\x96'  # ESC p 0 50 150
-        return self.print_raw_escpos(drawer_command)
+        return self.try_print_job(open_drawer=True)
+    
+    def try_print_job(self, **options):
+        """Führt print_job aus und meldet Erfolg als True/False"""
+        try:
+            self.print_job(**options)
+            return True
+        except Exception as e:
+            print(f"Druckfehler: {e}")
+            return False
     
     def print_test_page(self):
         """Druckt eine Testseite"""
-        test_data = {
-            'sale_id': 'TEST-001',
-            'cashier': 'System Test',
-            'payment_method': 'Bargeld',
-            'received_amount': 10.00,
-            'items': [
-                {
-                    'name': 'Test Artikel 1',
-                    'quantity': 2,
-                    'unit_price': 1.50,
-                    'total_price': 3.00
-                },
-                {
-                    'name': 'Test Artikel 2',
-                    'quantity': 1,
-                    'unit_price': 2.99,
-                    'total_price': 2.99
-                }
-            ]
-        }
-        
-        return self.print_receipt(test_data)
-    
-    def center_text(self, text):
-        """Zentriert Text für den Drucker"""
-        if len(text) >= self.width_chars:
-            return text
-        padding = (self.width_chars - len(text)) // 2
-        return " " * padding + text
-    
-    def format_price(self, price):
-        """Formatiert Preise"""
-        return f"{price:.2f}€"
+        return self.print_receipt(TEST_RECEIPT)
     
     def get_printer_status(self):
         """Gibt den Druckerstatus zurück"""
         try:
-            hprinter = win32print.OpenPrinter(self.printer_name)
-            try:
-                status = win32print.GetPrinter(hprinter, 2)
-                return {
-                    'online': True,
-                    'name': status['pPrinterName'],
-                    'status': status['Status'],
-                    'jobs': status['cJobs']
-                }
-            finally:
-                win32print.ClosePrinter(hprinter)
+            return self.transport.status()
         except Exception as e:
             return {
                 'online': False,
@@ -274,6 +306,232 @@ class EpsonTMT88VPrinter:
             }
 
 
+class PrinterManager:
+    """
+    Prozessweiter Zugriff auf den Belegdrucker
+    Der Drucker wird nur einmal ermittelt und geöffnet; alle Jobs laufen über
+    dasselbe Handle und werden per Lock serialisiert. Nach einem Fehler wird
+    der Drucker neu ermittelt und der Job einmal wiederholt.
+    """
+    
+    def __init__(self, printer_name=None):
+        """
+        :param printer_name: Druckerangabe, siehe printer_transports
+                             (None = KASSENSYSTEM_PRINTER bzw. Standarddrucker)
+        """
+        self.configured_name = printer_name
+        self._printer = None
+        self._lock = threading.RLock()
+    
+    @property
+    def printer(self):
+        """Gibt den geöffneten Drucker zurück und öffnet ihn bei Bedarf"""
+        with self._lock:
+            if self._printer is None:
+                printer = EpsonTMT88VPrinter(self.configured_name)
+                printer.open()
+                self._printer = printer
+            return self._printer
+    
+    @property
+    def printer_name(self):
+        return self.printer.printer_name
+    
+    def reset(self):
+        """Schließt den Drucker; der nächste Job verbindet sich neu"""
+        with self._lock:
+            if self._printer is not None:
+                try:
+                    self._printer.close()
+                except Exception:
+                    pass
+                self._printer = None
+    
+    def run(self, action):
+        """
+        Führt action(printer) exklusiv aus
+        Schlägt der Versuch fehl, wird neu verbunden und einmal wiederholt
+        :raises Exception: wenn auch der zweite Versuch fehlschlägt
+        """
+        with self._lock:
+            try:
+                return action(self.printer)
+            except Exception:
+                self.reset()
+            return action(self.printer)
+    
+    def print_receipt(self, sale_data, cut=False, open_drawer=False):
+        """Druckt einen Beleg, auf Wunsch mit Schnitt und Kassenschublade im selben Job"""
+        try:
+            self.run(lambda printer: printer.print_job(sale_data, cut=cut, open_drawer=open_drawer))
+            return {'success': True, 'message': 'Beleg erfolgreich gedruckt'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def print_rendered(self, rendered, cut=False, open_drawer=False):
+        """
+        Druckt einen bereits erzeugten Beleg, z.B. einen gespeicherten aus receipts
+        Die Kassenschublade geht nur beim ersten Versuch mit; die Wiederholung
+        in run() druckt nur den Beleg, damit die Schublade nicht zweimal aufspringt
+        """
+        drawer = [open_drawer]
+
+        def print_job(printer):
+            kick, drawer[0] = drawer[0], False
+            printer.print_job(rendered=rendered, cut=cut, open_drawer=kick)
+
+        try:
+            self.run(print_job)
+            return {'success': True, 'message': 'Beleg erfolgreich gedruckt'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def print_raw_escpos(self, commands):
+        """Sendet rohe ESC/POS Kommandos an den Drucker"""
+        try:
+            self.run(lambda printer: printer.write_job(commands, "ESC/POS Commands", "RAW"))
+            return True
+        except Exception as e:
+            print(f"Druckfehler: {e}")
+            return False
+    
+    def try_print_job(self, **options):
+        """Führt print_job aus und meldet Erfolg als True/False"""
+        try:
+            self.run(lambda printer: printer.print_job(**options))
+            return True
+        except Exception as e:
+            print(f"Druckfehler: {e}")
+            return False
+    
+    def cut_paper(self):
+        """Schneidet das Papier"""
+        return self.try_print_job(cut=True)
+    
+    def open_cash_drawer(self):
+        """Öffnet die Kassenschublade"""
+        return self.try_print_job(open_drawer=True)
+    
+    def print_test_page(self):
+        """Druckt eine Testseite"""
+        return self.print_receipt(TEST_RECEIPT)
+    
+    def get_printer_status(self):
+        """Gibt den Druckerstatus zurück"""
+        try:
+            return self.run(lambda printer: printer.get_printer_status())
+        except Exception as e:
+            return {'online': False, 'error': str(e)}
+    
+    def list_printers(self):
+        return self.run(lambda printer: printer.list_printers())
+    
+    def find_epson_printer(self):
+        return self.run(lambda printer: printer.find_epson_printer())
+
+
+class PrinterMonitor:
+    """
+    Fragt Druckerstatus und Druckerliste in einem Hintergrund-Thread ab
+    Die Routen liefern nur den zuletzt gemessenen Stand; ändert er sich,
+    werden die registrierten Listener aufgerufen
+    """
+    
+    def __init__(self, manager, interval=10.0):
+        """
+        :param manager: PrinterManager, dessen Drucker überwacht wird
+        :param interval: Sekunden zwischen zwei Abfragen
+        """
+        self.manager = manager
+        self.interval = interval
+        self.listeners = []
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def add_listener(self, callback):
+        """callback(snapshot) wird nach jeder Statusänderung aufgerufen"""
+        self.listeners.append(callback)
+    
+    def refresh(self):
+        """Fragt den Drucker ab und speichert das Ergebnis"""
+        snapshot = {'status': self.manager.get_printer_status()}
+        try:
+            snapshot['printers'] = {
+                'available': self.manager.list_printers(),
+                'epson_found': self.manager.find_epson_printer(),
+                'current': self.manager.printer_name
+            }
+        except Exception as e:
+            snapshot['printer_error'] = str(e)
+        
+        with self._lock:
+            changed = snapshot != self._snapshot
+            self._snapshot = snapshot
+            self._checked_at = time.time()
+        
+        if changed:
+            for callback in self.listeners:
+                try:
+                    callback(self.snapshot())
+                except Exception as e:
+                    print(f"Druckerüberwachung: {e}")
+    
+    def snapshot(self):
+        """
+        Gibt den zuletzt gemessenen Stand mit Zeitpunkt und Alter zurück
+        Läuft der Monitor-Thread nicht, wird synchron abgefragt, sobald der
+        Stand älter als das Intervall ist
+        """
+        running = self._thread is not None and self._thread.is_alive()
+        if self._snapshot is None or (not running and time.time() - self._checked_at >= self.interval):
+            self.refresh()
+        with self._lock:
+            return dict(
+                self._snapshot,
+                checked_at=datetime.fromtimestamp(self._checked_at).isoformat(timespec='seconds'),
+                age_seconds=round(time.time() - self._checked_at, 3)
+            )
+    
+    def request_refresh(self):
+        """Veranlasst eine sofortige Abfrage, z.B. nach einem Druckfehler"""
+        self._wakeup.set()
+    
+    def start(self):
+        """Startet den Hintergrund-Thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='printer-monitor', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Druckerüberwachung: {e}")
+            self._wakeup.wait(self.interval)
+
+
+# Erzeugt Belege beim Verkauf, auch ohne angeschlossenen Drucker
+receipt_formatter = ReceiptFormatter()
+
+# Gemeinsamer Drucker für alle Routen und die Druckwarteschlange
+printer_manager = PrinterManager()
+printer_monitor = PrinterMonitor(printer_manager)
+
+
 # Flask Integration
 def add_printer_routes(app):
     """
@@ -281,34 +539,36 @@ def add_printer_routes(app):
     """
     @app.route('/api/printer/status')
     def printer_status():
-        printer = EpsonTMT88VPrinter()
-        status = printer.get_printer_status()
-        return {'printer': status}
+        # Zwischengespeicherter Stand aus dem PrinterMonitor
+        snapshot = printer_monitor.snapshot()
+        return {
+            'printer': snapshot['status'],
+            'checked_at': snapshot['checked_at'],
+            'age_seconds': snapshot['age_seconds']
+        }
     
     @app.route('/api/printer/test', methods=['POST'])
     def print_test():
-        printer = EpsonTMT88VPrinter()
-        result = printer.print_test_page()
+        result = printer_manager.print_test_page()
         return result
     
     @app.route('/api/printer/receipt', methods=['POST'])
     def print_receipt():
         from flask import request
         data = request.json
-        printer = EpsonTMT88VPrinter()
-        result = printer.printer_receipt(data)
+        result = printer_manager.print_receipt(
+            data, cut=data.get('cut', False), open_drawer=data.get('open_drawer', False)
+        )
         return result
     
     @app.route('/api/printer/cut')
     def cut_paper():
-        printer = EpsonTMT88VPrinter()
-        success = printer.cut_paper()
+        success = printer_manager.cut_paper()
         return {'success': success}
     
     @app.route('/api/printer/drawer')
     def open_drawer():
-        printer = EpsonTMT88VPrinter()
-        success = printer.open_cash_drawer()
+        success = printer_manager.open_cash_drawer()
         return {'success': success}
 
 
@@ -327,7 +587,7 @@ if __name__ == "__main__":
     epson = printer.find_epson_printer()
     if epson:
         print(f"Epson Drucker gefunden: {epson}")
-        printer.printer_name = epson
+        printer = EpsonTMT88VPrinter(epson)
     
     # Status prüfen
     status = printer.get_printer_status()
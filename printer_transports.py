@@ -0,0 +1,282 @@
+"""
+Übertragungswege zum Belegdrucker
+EpsonTMT88VPrinter erzeugt die ESC/POS Daten, ein Transport bringt sie zum
+Drucker: Windows Druckerspooler, Netzwerkdrucker (TCP Port 9100),
+Gerätedatei (/dev/usb/lp*) oder ein virtueller Drucker im Prozess.
+
+Der Transport wird über die Umgebungsvariable KASSENSYSTEM_PRINTER gewählt:
+    tcp://192.168.1.50:9100     Netzwerkdrucker (Port 9100 ist Standard)
+    file:///dev/usb/lp0         Gerätedatei (oder direkt /dev/usb/lp0)
+    virtual://?throughput=2000  Virtueller Drucker, Durchsatz in Bytes/s
+    EPSON TM-T88V Receipt       Windows Druckername
+Ohne Angabe wird der Windows Standarddrucker verwendet.
+"""
+import collections
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import win32print
+except ImportError:
+    win32print = None
+
+PRINTER_ENV = 'KASSENSYSTEM_PRINTER'
+DEFAULT_TCP_PORT = 9100
+
+# DLE EOT 1: Echtzeit-Druckerstatus (ESC/POS)
+STATUS_REQUEST = b'\x10\x04\x01'
+
+
+class Win32Transport:
+    """Druck über den Windows Druckerspooler (pywin32)"""
+
+    def __init__(self, printer_name=None):
+        """
+        :param printer_name: Name des Druckers (None = Standarddrucker)
+        :raises RuntimeError: wenn pywin32 nicht installiert ist
+        """
+        if win32print is None:
+            raise RuntimeError('pywin32 ist nicht installiert')
+        self.name = printer_name or self.get_default_printer()
+        self._handle = None
+
+    @staticmethod
+    def list_printers():
+        """Listet alle lokalen Windows Drucker auf"""
+        if win32print is None:
+            return []
+        return [printer[2] for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL)]
+
+    def get_default_printer(self):
+        """Gibt den Standarddrucker zurück"""
+        try:
+            return win32print.GetDefaultPrinter()
+        except Exception:
+            # Fallback: Ersten verfügbaren Drucker nehmen
+            printers = self.list_printers()
+            return printers[0] if printers else None
+
+    def open(self):
+        if self._handle is None:
+            self._handle = win32print.OpenPrinter(self.name)
+
+    def close(self):
+        if self._handle is not None:
+            try:
+                win32print.ClosePrinter(self._handle)
+            finally:
+                self._handle = None
+
+    def write(self, data, job_name, datatype=None):
+        """
+        Sendet Bytes als einen Druckjob an den Spooler
+        Verwendet das offene Handle, sonst wird der Drucker nur für diesen Job geöffnet
+        """
+        hprinter = self._handle
+        if hprinter is None:
+            hprinter = win32print.OpenPrinter(self.name)
+
+        try:
+            win32print.StartDocPrinter(hprinter, 1, (job_name, None, datatype))
+            try:
+                win32print.StartPagePrinter(hprinter)
+                win32print.WritePrinter(hprinter, data)
+                win32print.EndPagePrinter(hprinter)
+            finally:
+                win32print.EndDocPrinter(hprinter)
+        finally:
+            if hprinter is not self._handle:
+                win32print.ClosePrinter(hprinter)
+
+    def status(self):
+        hprinter = self._handle or win32print.OpenPrinter(self.name)
+        try:
+            status = win32print.GetPrinter(hprinter, 2)
+            return {
+                'online': True,
+                'name': status['pPrinterName'],
+                'status': status['Status'],
+                'jobs': status['cJobs']
+            }
+        finally:
+            if hprinter is not self._handle:
+                win32print.ClosePrinter(hprinter)
+
+
+class TcpTransport:
+    """Netzwerkdrucker im RAW-Modus (TM-T88 mit Ethernet-Schnittstelle)"""
+
+    def __init__(self, host, port=DEFAULT_TCP_PORT, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.name = f'tcp://{host}:{port}'
+        self._socket = None
+
+    def open(self):
+        if self._socket is None:
+            self._socket = socket.create_connection((self.host, self.port), self.timeout)
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+    def write(self, data, job_name=None, datatype=None):
+        if self._socket is not None:
+            self._socket.sendall(data)
+            return
+        # Ohne offene Verbindung nur für diesen Job verbinden
+        with socket.create_connection((self.host, self.port), self.timeout) as sock:
+            sock.sendall(data)
+
+    def status(self):
+        """
+        Fragt den Echtzeitstatus per DLE EOT 1 ab
+        Bit 3 gesetzt bedeutet: Drucker offline
+        """
+        self.open()
+        self._socket.sendall(STATUS_REQUEST)
+        response = self._socket.recv(1)
+        if not response:
+            raise ConnectionError('Verbindung vom Drucker geschlossen')
+        return {
+            'online': not response[0] & 0x08,
+            'name': self.name,
+            'status': response[0],
+            'jobs': 0
+        }
+
+
+class DeviceTransport:
+    """Direkt angeschlossener Drucker über eine Gerätedatei wie /dev/usb/lp0"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+        self._file = None
+
+    def open(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab', buffering=0)
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    def write(self, data, job_name=None, datatype=None):
+        if self._file is not None:
+            self._file.write(data)
+            return
+        with open(self.path, 'ab', buffering=0) as f:
+            f.write(data)
+
+    def status(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f'Gerät {self.path} nicht gefunden')
+        return {
+            'online': os.access(self.path, os.W_OK),
+            'name': self.name,
+            'status': 0,
+            'jobs': 0
+        }
+
+
+class VirtualTransport:
+    """
+    Virtueller Drucker für Tests und Lastmessungen ohne Hardware
+    Zeichnet die gesendeten ESC/POS Daten auf und wartet pro Job so lange,
+    wie ein echter Drucker mit dem eingestellten Durchsatz bräuchte
+    """
+
+    def __init__(self, throughput=None, max_jobs=1000):
+        """
+        :param throughput: simulierter Durchsatz in Bytes pro Sekunde (None = sofort)
+        :param max_jobs: so viele Jobs werden aufbewahrt
+        """
+        self.throughput = throughput
+        self.name = 'virtual://' + (f'?throughput={throughput:g}' if throughput else '')
+        self.jobs = collections.deque(maxlen=max_jobs)
+        self.job_count = 0
+        self.bytes_written = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def write(self, data, job_name=None, datatype=None):
+        data = bytes(data)
+        duration = len(data) / self.throughput if self.throughput else 0.0
+        if duration:
+            time.sleep(duration)
+        with self._lock:
+            self.jobs.append({'name': job_name, 'data': data, 'printed_at': time.time()})
+            self.job_count += 1
+            self.bytes_written += len(data)
+            self.busy_seconds += duration
+
+    def output(self):
+        """Gibt alle aufbewahrten Jobs als ein Bytestrom zurück"""
+        with self._lock:
+            return b''.join(job['data'] for job in self.jobs)
+
+    def status(self):
+        with self._lock:
+            return {
+                'online': True,
+                'name': self.name,
+                'status': 0,
+                'jobs': 0,
+                'printed_jobs': self.job_count,
+                'bytes_written': self.bytes_written,
+                'busy_seconds': round(self.busy_seconds, 3)
+            }
+
+
+def create_transport(spec=None):
+    """
+    Erzeugt den Transport zu einer Druckerangabe
+    :param spec: siehe Moduldokumentation; None = KASSENSYSTEM_PRINTER bzw.
+                 Windows Standarddrucker
+    :raises ValueError: bei ungültiger Angabe
+    :raises RuntimeError: wenn für einen Windows Drucker pywin32 fehlt
+    """
+    spec = spec if spec is not None else os.environ.get(PRINTER_ENV)
+    if not spec:
+        return Win32Transport()
+
+    if spec.startswith('/dev/'):
+        return DeviceTransport(spec)
+
+    parts = urlsplit(spec)
+    if parts.scheme == 'tcp':
+        if not parts.hostname:
+            raise ValueError(f'Kein Host in {spec}')
+        return TcpTransport(parts.hostname, parts.port or DEFAULT_TCP_PORT)
+    if parts.scheme == 'file':
+        return DeviceTransport(parts.path)
+    if parts.scheme == 'virtual':
+        throughput = parse_qs(parts.query).get('throughput', [None])[0]
+        return VirtualTransport(float(throughput) if throughput else None)
+    if parts.scheme == 'win32':
+        return Win32Transport(spec[len('win32://'):] or None)
+
+    # Alles andere ist ein Windows Druckername
+    return Win32Transport(spec)
+
+
+def printer_configured():
+    """True, wenn ein Drucker konfiguriert ist oder der Windows Spooler bereitsteht"""
+    return bool(os.environ.get(PRINTER_ENV)) or win32print is not None
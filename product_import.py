@@ -0,0 +1,198 @@
+"""
+Massenimport von Produkten (CSV oder NDJSON)
+Der Request-Body wird zeilenweise gelesen und nie komplett im Speicher
+gehalten. Produkte werden per Barcode eingefügt oder aktualisiert, jeweils
+chunk_size Zeilen mit executemany in einer Transaktion.
+
+Die Antwort ist NDJSON: je Fehler eine Zeile, nach jedem Chunk eine
+Fortschrittszeile und am Ende eine Zusammenfassung.
+"""
+import csv
+import io
+import itertools
+import json
+
+from flask import request, stream_with_context
+
+from catalog import catalog, publish_product_changes, record_changes
+from database import get_db
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 5000
+
+# Fehlende Spalten (stock, category) lassen bestehende Werte unverändert
+UPSERT_SQL = '''
+    INSERT INTO products (name, price, category, barcode, stock)
+    VALUES (?1, ?2, COALESCE(?3, ''), ?4, COALESCE(?5, 0))
+    ON CONFLICT (barcode) DO UPDATE SET
+        name = excluded.name,
+        price = excluded.price,
+        category = COALESCE(?3, products.category),
+        stock = COALESCE(?5, products.stock)
+'''
+
+
+def parse_product(record):
+    """
+    Prüft einen Datensatz und wandelt ihn in Parameter für UPSERT_SQL um
+    :raises ValueError: mit deutscher Fehlermeldung
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Datensatz ist kein Objekt')
+
+    name = str(record.get('name') or '').strip()
+    if not name:
+        raise ValueError('name fehlt')
+    barcode = str(record.get('barcode') or '').strip()
+    if not barcode:
+        raise ValueError('barcode fehlt')
+
+    try:
+        price = float(str(record.get('price')).replace(',', '.'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Ungültiger Preis: {record.get('price')!r}")
+    if price < 0:
+        raise ValueError('Preis darf nicht negativ sein')
+
+    stock = record.get('stock')
+    if stock in (None, ''):
+        stock = None
+    else:
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError):
+            raise ValueError(f'Ungültiger Bestand: {stock!r}')
+
+    category = record.get('category')
+    if category is not None:
+        category = str(category).strip()
+
+    return (name, price, category, barcode, stock)
+
+
+def read_csv(lines):
+    """
+    Liefert (Zeilennummer, Datensatz) aus CSV-Zeilen mit Kopfzeile
+    Trennzeichen ',' oder ';' wird an der Kopfzeile erkannt
+    """
+    header = next(lines, None)
+    if header is None:
+        return
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(itertools.chain([header], lines), delimiter=delimiter)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_ndjson(lines):
+    """Liefert (Zeilennummer, Datensatz) aus NDJSON, ein JSON-Objekt pro Zeile"""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f'Ungültiges JSON: {e.msg}')
+
+
+def import_products(conn, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importiert Produkte in Chunks und liefert dabei Statusmeldungen
+    :param records: Iterator aus (Zeilennummer, Datensatz) wie von read_csv
+    :return: Generator mit Dictionaries (type = error, progress, done)
+    """
+    totals = {'rows': 0, 'inserted': 0, 'updated': 0, 'errors': 0}
+    chunk = []
+
+    def flush():
+        inserted, updated = write_chunk(conn, chunk)
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        chunk.clear()
+
+    for line_number, record in records:
+        totals['rows'] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            chunk.append(parse_product(record))
+        except ValueError as e:
+            totals['errors'] += 1
+            yield {'type': 'error', 'line': line_number, 'error': str(e)}
+            continue
+
+        if len(chunk) >= chunk_size:
+            flush()
+            yield {'type': 'progress', **totals}
+
+    if chunk:
+        flush()
+    yield {'type': 'done', **totals}
+
+
+def write_chunk(conn, rows):
+    """
+    Schreibt einen Chunk in einer Transaktion und aktualisiert den Katalog
+    :return: (eingefügt, aktualisiert)
+    """
+    barcodes = sorted({row[3] for row in rows})
+    placeholders = ', '.join('?' * len(barcodes))
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        existing = conn.execute(
+            f'SELECT COUNT(*) FROM products WHERE barcode IN ({placeholders})', barcodes
+        ).fetchone()[0]
+        conn.executemany(UPSERT_SQL, rows)
+        product_ids = [
+            row[0] for row in conn.execute(
+                f'SELECT id FROM products WHERE barcode IN ({placeholders})', barcodes
+            )
+        ]
+        # Eine Katalogversion pro Chunk; Clients laden neue und geänderte gleich
+        record_changes(conn, product_ids, 'update')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    catalog.refresh(conn, product_ids)
+    publish_product_changes(product_ids)
+    return len(barcodes) - existing, existing
+
+
+def request_records(fmt):
+    """Liest den Request-Body zeilenweise als CSV oder NDJSON"""
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        return read_csv(lines)
+    return read_ndjson(lines)
+
+
+# Flask Integration
+def add_import_routes(app):
+    """
+    Fügt die Import-Route zur Flask App hinzu
+    """
+    @app.route('/api/products/import', methods=['POST'])
+    def import_products_route():
+        fmt = request.args.get('format')
+        if fmt is None:
+            fmt = 'ndjson' if 'json' in (request.mimetype or '') else 'csv'
+        if fmt not in ('csv', 'ndjson'):
+            return {'error': 'format muss csv oder ndjson sein'}, 400
+        chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+        if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+            return {'error': f'chunk_size muss zwischen 1 und {MAX_CHUNK_SIZE} liegen'}, 400
+
+        @stream_with_context
+        def generate():
+            conn = get_db()
+            try:
+                for message in import_products(conn, request_records(fmt), chunk_size):
+                    yield json.dumps(message, ensure_ascii=False) + '\n'
+            except Exception as e:
+                # Bereits übernommene Chunks bleiben erhalten
+                yield json.dumps({'type': 'failed', 'error': str(e)}, ensure_ascii=False) + '\n'
+
+        return app.response_class(generate(), mimetype='application/x-ndjson')
@@ -0,0 +1,189 @@
+"""
+Produktsuche nach Name und Kategorie über den FTS5-Index products_fts
+Der Index wird von Triggern auf products aktuell gehalten (siehe database.py).
+Jeder Suchbegriff wird als Präfix gesucht, Treffer im Namen zählen mehr als in
+der Kategorie. Findet die Suche nichts, werden Tippfehler über das Vokabular
+des Index korrigiert: ein Zeichen falsch, zu viel, zu wenig oder vertauscht.
+"""
+import re
+import unicodedata
+
+from flask import jsonify, request
+
+from database import get_db
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Höchstens so viele Treffer können geblättert werden
+MAX_RESULTS = 1000
+# Weitere Begriffe einer Suchanfrage werden ignoriert
+MAX_TERMS = 8
+# Kürzere Begriffe werden nicht auf Tippfehler geprüft
+MIN_FUZZY_LENGTH = 4
+# Höchstens so viele Korrekturen pro Begriff, häufigste zuerst
+MAX_CORRECTIONS = 10
+# Gewichtung für bm25: Name, Kategorie
+NAME_WEIGHT = 10.0
+CATEGORY_WEIGHT = 1.0
+
+_TERM_PATTERN = re.compile(r'[^\W_]+')
+
+
+def search_terms(query):
+    """
+    Zerlegt die Suchanfrage wie der Tokenizer des Index
+    (Kleinbuchstaben, Akzente und Umlaute ohne Zeichen: "Müsli" -> "musli")
+    """
+    normalized = unicodedata.normalize('NFKD', query.lower())
+    normalized = ''.join(char for char in normalized if not unicodedata.combining(char))
+    return _TERM_PATTERN.findall(normalized)[:MAX_TERMS]
+
+
+def within_one_edit(a, b):
+    """Prüft, ob sich a und b um höchstens ein Zeichen unterscheiden (auch Vertauschung)"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        # Ein Zeichen ersetzt oder zwei Nachbarzeichen vertauscht
+        return a[i + 1:] == b[i + 1:] or (
+            a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    if len(a) > len(b):
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+def similar_terms(conn, term):
+    """
+    Sucht Begriffe im Index, die term bis auf einen Tippfehler entsprechen
+    Auch Präfixe zählen ("schokl" findet "schokolade"). Der erste Buchstabe
+    muss stimmen, damit nur ein kleiner Bereich des Vokabulars gelesen wird.
+    """
+    length = len(term)
+    candidates = []
+    for candidate, documents in conn.execute(
+        'SELECT term, doc FROM products_fts_vocab WHERE term >= ? AND term < ?',
+        (term[0], term[0] + '\U0010ffff')
+    ):
+        if len(candidate) < length - 1 or candidate.startswith(term):
+            continue
+        if any(within_one_edit(term, candidate[:n]) for n in (length - 1, length, length + 1)):
+            candidates.append((documents, candidate))
+    candidates.sort(reverse=True)
+    return [candidate for _, candidate in candidates[:MAX_CORRECTIONS]]
+
+
+def match_expression(terms, corrections=None):
+    """
+    Baut den FTS5-Ausdruck: alle Begriffe müssen vorkommen, jeweils als Präfix
+    oder als eine der Korrekturen
+    """
+    parts = []
+    for term in terms:
+        options = [f'"{term}"*'] + [f'"{word}"' for word in (corrections or {}).get(term, [])]
+        parts.append(options[0] if len(options) == 1 else f"({' OR '.join(options)})")
+    return ' AND '.join(parts)
+
+
+def run_search(conn, expression, category, limit, offset):
+    """
+    Führt die Suche aus, beste Treffer zuerst
+    Alle Treffer werden bewertet, übernommen werden die besten MAX_RESULTS
+    """
+    params = [expression]
+    category_join = category_filter = ''
+    if category:
+        # Die Kategorie-Spalte des Index grenzt die Treffer vorab ein,
+        # der Vergleich mit products.category prüft sie genau
+        terms = search_terms(category)
+        if terms:
+            params[0] = ' AND '.join([f'({expression})'] + [f'category : "{term}"' for term in terms])
+        category_join = 'JOIN products p ON p.id = products_fts.rowid'
+        category_filter = 'AND p.category = ?'
+        params.append(category)
+    params.extend([MAX_RESULTS, limit, offset])
+    return conn.execute(f'''
+        SELECT p.id, p.name, p.price, p.category, p.barcode, p.stock
+        FROM (
+            SELECT products_fts.rowid AS id,
+                   bm25(products_fts, {NAME_WEIGHT}, {CATEGORY_WEIGHT}) AS score
+            FROM products_fts
+            {category_join}
+            WHERE products_fts MATCH ? {category_filter}
+            ORDER BY score, products_fts.rowid
+            LIMIT ?
+        ) matches
+        JOIN products p ON p.id = matches.id
+        ORDER BY matches.score, p.id
+        LIMIT ? OFFSET ?
+    ''', params).fetchall()
+
+
+def search_products(conn, query, category=None, limit=DEFAULT_LIMIT, offset=0):
+    """
+    Sucht Produkte nach Name und Kategorie
+    :param category: nur Produkte genau dieser Kategorie
+    :return: (Trefferzeilen, fuzzy) - fuzzy ist True, wenn Tippfehler
+             korrigiert werden mussten
+    :raises ValueError: bei leerer Suche oder ungültigen Parametern
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit muss zwischen 1 und {MAX_LIMIT} liegen')
+    if offset < 0 or offset + limit > MAX_RESULTS:
+        raise ValueError(f'Es können höchstens die ersten {MAX_RESULTS} Treffer abgerufen werden')
+    terms = search_terms(query or '')
+    if not terms:
+        raise ValueError('Suchbegriff fehlt')
+
+    expression = match_expression(terms)
+    rows = run_search(conn, expression, category, limit, offset)
+    if rows or (offset > 0 and run_search(conn, expression, category, 1, 0)):
+        return rows, False
+
+    # Keine exakten Treffer: Tippfehler in den längeren Begriffen korrigieren
+    corrections = {
+        term: similar_terms(conn, term) for term in terms if len(term) >= MIN_FUZZY_LENGTH
+    }
+    if not any(corrections.values()):
+        return rows, False
+    return run_search(conn, match_expression(terms, corrections), category, limit, offset), True
+
+
+# Flask Integration
+def add_search_routes(app):
+    """
+    Fügt die Produktsuche zur Flask App hinzu
+    """
+    @app.route('/api/products/search')
+    def search_products_route():
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        try:
+            rows, fuzzy = search_products(
+                get_db(), query, request.args.get('category'), limit, offset
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'query': query,
+            'fuzzy': fuzzy,
+            'results': [
+                {
+                    'id': row[0],
+                    'name': row[1],
+                    'price': row[2],
+                    'category': row[3],
+                    'barcode': row[4],
+                    'stock': row[5]
+                }
+                for row in rows
+            ],
+            'next_offset': offset + limit if len(rows) == limit else None
+        })
@@ -0,0 +1,134 @@
+"""
+Gespeicherte Belege
+Der Beleg wird beim Verkauf einmal als ESC/POS Bytes erzeugt und
+zlib-komprimiert in receipts abgelegt. Nachdrucke senden genau diese Bytes
+erneut, mit Artikelnamen und Uhrzeit des Verkaufs.
+"""
+import zlib
+
+# Höchstens so viele Verkäufe pro Sammel-Nachdruck
+MAX_REPRINT_RANGE = 500
+
+
+def store_receipt(conn, sale_id, data):
+    """Speichert einen erzeugten Beleg; der Aufrufer committet"""
+    conn.execute(
+        'INSERT OR REPLACE INTO receipts (sale_id, data) VALUES (?, ?)',
+        (sale_id, zlib.compress(data))
+    )
+
+
+def load_receipt(conn, sale_id):
+    """Gibt die Bytes des gespeicherten Belegs zurück, None wenn keiner existiert"""
+    row = conn.execute('SELECT data FROM receipts WHERE sale_id = ?', (sale_id,)).fetchone()
+    return zlib.decompress(row[0]) if row else None
+
+
+def receipt_data(sale_id, data, product_names, created_at=None):
+    """
+    Baut die Belegdaten für einen neuen Verkauf
+    :param data: Verkaufsdaten wie von POST /api/sales
+    :param product_names: Dictionary Produkt-ID -> Name zum Zeitpunkt des Verkaufs
+    :param created_at: Verkaufszeitpunkt (UTC) bei nachgereichten Verkäufen, sonst jetzt
+    """
+    sale_data = {
+        'sale_id': sale_id,
+        'created_at': created_at,
+        'total_amount': data['total_amount'],
+        'payment_method': data['payment_method'],
+        'cashier': data.get('cashier', 'System'),
+        'items': [
+            {
+                'name': product_names.get(item['product_id'], 'Unbekannt'),
+                'quantity': item['quantity'],
+                'unit_price': item['unit_price'],
+                'total_price': item['total_price']
+            }
+            for item in data['items']
+        ]
+    }
+    if data.get('received_amount') is not None:
+        sale_data['received_amount'] = data['received_amount']
+    return sale_data
+
+
+def load_receipt_data(conn, sale_id):
+    """
+    Liest die Belegdaten eines Verkaufs aus der Datenbank
+    Nur für Verkäufe ohne gespeicherten Beleg; verwendet die aktuellen Produktnamen
+    :return: Belegdaten oder None, wenn es den Verkauf nicht gibt
+    """
+    sale_row = conn.execute(
+        'SELECT id, total_amount, payment_method, created_at, cashier FROM sales WHERE id = ?',
+        (sale_id,)
+    ).fetchone()
+    if not sale_row:
+        return None
+
+    items = []
+    for row in conn.execute('''
+        SELECT p.name, si.quantity, si.unit_price, si.total_price
+        FROM sale_items si
+        JOIN products p ON si.product_id = p.id
+        WHERE si.sale_id = ?
+    ''', (sale_id,)):
+        items.append({
+            'name': row[0],
+            'quantity': row[1],
+            'unit_price': row[2],
+            'total_price': row[3]
+        })
+
+    return {
+        'sale_id': sale_row[0],
+        'total_amount': sale_row[1],
+        'payment_method': sale_row[2],
+        'created_at': sale_row[3],
+        'cashier': sale_row[4],
+        'items': items
+    }
+
+
+def get_or_render_receipt(conn, sale_id, render):
+    """
+    Gibt den gespeicherten Beleg zurück
+    Ältere Verkäufe ohne gespeicherten Beleg werden einmalig mit render erzeugt
+    und abgelegt
+    :param render: Funktion(Belegdaten) -> Bytes
+    :return: Bytes oder None, wenn es den Verkauf nicht gibt
+    """
+    data = load_receipt(conn, sale_id)
+    if data is not None:
+        return data
+
+    sale_data = load_receipt_data(conn, sale_id)
+    if sale_data is None:
+        return None
+    data = render(sale_data)
+    store_receipt(conn, sale_id, data)
+    conn.commit()
+    return data
+
+
+def receipts_in_range(conn, first_id, last_id, render):
+    """
+    Liefert (sale_id, Bytes) für alle Verkäufe im ID-Bereich, aufsteigend
+    Gespeicherte Belege werden mit einer Abfrage gelesen
+    :raises ValueError: bei ungültigem oder zu großem Bereich
+    """
+    if first_id > last_id:
+        raise ValueError('from_id darf nicht größer als to_id sein')
+    if last_id - first_id + 1 > MAX_REPRINT_RANGE:
+        raise ValueError(f'Höchstens {MAX_REPRINT_RANGE} Verkäufe pro Nachdruck')
+
+    rows = conn.execute('''
+        SELECT s.id, r.data FROM sales s
+        LEFT JOIN receipts r ON r.sale_id = s.id
+        WHERE s.id BETWEEN ? AND ?
+        ORDER BY s.id
+    ''', (first_id, last_id)).fetchall()
+    for sale_id, data in rows:
+        if data is None:
+            yield sale_id, get_or_render_receipt(conn, sale_id, render)
+        else:
+            yield sale_id, zlib.decompress(data)
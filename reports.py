@@ -0,0 +1,130 @@
+"""
+Berichte auf Basis vorverdichteter Tageswerte
+create_sale pflegt die Tabellen daily_payment_totals und daily_product_totals
+in derselben Transaktion, sodass Tagesberichte nie die Rohdaten lesen müssen
+"""
+import argparse
+import sys
+
+from database import DB_PATH, get_db, upgrade_schema
+
+
+def record_sale_rollups(conn, sale_id):
+    """
+    Verbucht einen Verkauf in den Tageswerten
+    Muss innerhalb der Transaktion aufgerufen werden, die den Verkauf anlegt
+    """
+    conn.execute('''
+        INSERT INTO daily_payment_totals (day, payment_method, transaction_count, total_revenue)
+        SELECT DATE(created_at), payment_method, 1, total_amount
+        FROM sales WHERE id = ?
+        ON CONFLICT (day, payment_method) DO UPDATE SET
+            transaction_count = transaction_count + excluded.transaction_count,
+            total_revenue = total_revenue + excluded.total_revenue
+    ''', (sale_id,))
+    conn.execute('''
+        INSERT INTO daily_product_totals (day, product_id, quantity, revenue)
+        SELECT DATE(s.created_at), si.product_id, SUM(si.quantity), SUM(si.total_price)
+        FROM sale_items si
+        JOIN sales s ON si.sale_id = s.id
+        WHERE si.sale_id = ?
+        GROUP BY si.product_id
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    ''', (sale_id,))
+
+
+def rebuild_rollups(conn):
+    """Berechnet alle Tageswerte neu aus sales und sale_items"""
+    conn.execute('DELETE FROM daily_payment_totals')
+    conn.execute('DELETE FROM daily_product_totals')
+    conn.execute('''
+        INSERT INTO daily_payment_totals (day, payment_method, transaction_count, total_revenue)
+        SELECT DATE(created_at), payment_method, COUNT(*), SUM(total_amount)
+        FROM sales
+        GROUP BY DATE(created_at), payment_method
+    ''')
+    conn.execute('''
+        INSERT INTO daily_product_totals (day, product_id, quantity, revenue)
+        SELECT DATE(s.created_at), si.product_id, SUM(si.quantity), SUM(si.total_price)
+        FROM sale_items si
+        JOIN sales s ON si.sale_id = s.id
+        GROUP BY DATE(s.created_at), si.product_id
+    ''')
+    conn.commit()
+
+
+def build_daily_report(conn, date):
+    """
+    Erstellt den Tagesbericht ausschließlich aus den Tageswerten
+    :param date: Datum im Format YYYY-MM-DD
+    """
+    cursor = conn.cursor()
+
+    # Umsätze je Zahlungsart
+    cursor.execute('''
+        SELECT payment_method, transaction_count, total_revenue
+        FROM daily_payment_totals
+        WHERE day = ?
+    ''', (date,))
+
+    payment_summary = []
+    total_revenue = 0
+    total_transactions = 0
+
+    for row in cursor.fetchall():
+        payment_summary.append({
+            'payment_method': row[0],
+            'count': row[1],
+            'amount': row[2] if row[2] else 0
+        })
+        if row[2]:
+            total_revenue += row[2]
+        total_transactions += row[1]
+
+    # Meistverkaufte Produkte
+    cursor.execute('''
+        SELECT p.name, d.quantity, d.revenue
+        FROM daily_product_totals d
+        JOIN products p ON d.product_id = p.id
+        WHERE d.day = ?
+        ORDER BY d.quantity DESC
+        LIMIT 10
+    ''', (date,))
+
+    top_products = []
+    for row in cursor.fetchall():
+        top_products.append({
+            'name': row[0],
+            'quantity': row[1],
+            'revenue': row[2]
+        })
+
+    return {
+        'date': date,
+        'total_revenue': total_revenue,
+        'total_transactions': total_transactions,
+        'avg_transaction': total_revenue / total_transactions if total_transactions > 0 else 0,
+        'payment_summary': payment_summary,
+        'top_products': top_products
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verwaltung der Berichts-Tageswerte')
+    parser.add_argument('command', choices=['rebuild'], help='rebuild: Tageswerte aus den Rohdaten neu aufbauen')
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        conn = get_db()
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = {'products', 'sales', 'sale_items'} - existing
+        if missing:
+            # Die Grundtabellen legt erst der Start der App an (init_db)
+            sys.exit(f"❌ {DB_PATH} enthält keine Kassendaten (fehlt: {', '.join(sorted(missing))}). "
+                     f"Bitte zuerst die App einmal starten.")
+        upgrade_schema(conn)
+        rebuild_rollups(conn)
+        days = conn.execute('SELECT COUNT(DISTINCT day) FROM daily_payment_totals').fetchone()[0]
+        print(f"✅ Tageswerte neu aufgebaut ({days} Tage)")
@@ -0,0 +1,356 @@
+"""
+Schreibpfad für Verkäufe
+Legt einen Verkauf mit allen Positionen in einer einzigen Transaktion an:
+ein INSERT für den Beleg, executemany für die Positionen und ein
+mengenbasiertes UPDATE für den Lagerbestand des ganzen Warenkorbs.
+Offline erfasste Verkäufe der Mobilkasse kommen gesammelt über
+POST /api/sales/batch und werden über ihre client_id nur einmal gebucht.
+"""
+from datetime import datetime
+
+from flask import jsonify, request
+
+from catalog import catalog, publish_product_changes, record_changes
+from database import day_range, get_db
+from events import broker
+from print_queue import PrintQueue
+from receipts import receipt_data, store_receipt
+from reports import record_sale_rollups
+
+# Obergrenze für eine Seite der Verkaufsliste
+MAX_PAGE_SIZE = 500
+# Obergrenzen für POST /api/sales/batch
+MAX_BATCH_SIZE = 1000
+MAX_CLIENT_ID_LENGTH = 64
+
+
+def find_unknown_products(conn, product_ids):
+    """Gibt die IDs zurück, zu denen es kein Produkt gibt"""
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return []
+    placeholders = ', '.join('?' * len(product_ids))
+    known = {
+        row[0] for row in conn.execute(
+            f'SELECT id FROM products WHERE id IN ({placeholders})', product_ids
+        )
+    }
+    return [product_id for product_id in product_ids if product_id not in known]
+
+
+def write_sale(conn, data, client_id=None, created_at=None, render_receipt=None):
+    """
+    Schreibt Verkauf, Positionen und Tageswerte; Lagerbestand, Katalog und
+    Commit übernimmt der Aufrufer
+    :param client_id: Eindeutige Kennung des Geräts für diesen Verkauf
+    :param created_at: Verkaufszeitpunkt (UTC), sonst jetzt
+    :return: ID des neuen Verkaufs
+    """
+    items = data['items']
+    cursor = conn.execute(
+        'INSERT INTO sales (total_amount, payment_method, cashier, item_count, total_quantity, '
+        'client_id, created_at) VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+        (data['total_amount'], data['payment_method'], data.get('cashier', 'System'),
+         len(items), sum(item['quantity'] for item in items), client_id, created_at)
+    )
+    sale_id = cursor.lastrowid
+
+    conn.executemany(
+        'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
+        [
+            (sale_id, item['product_id'], item['quantity'], item['unit_price'], item['total_price'])
+            for item in items
+        ]
+    )
+
+    # Tageswerte für Berichte in derselben Transaktion fortschreiben
+    record_sale_rollups(conn, sale_id)
+
+    if render_receipt is not None:
+        product_ids = sorted({item['product_id'] for item in items})
+        placeholders = ', '.join('?' * len(product_ids))
+        names = dict(conn.execute(
+            f'SELECT id, name FROM products WHERE id IN ({placeholders})', product_ids
+        ))
+        store_receipt(conn, sale_id, render_receipt(receipt_data(sale_id, data, names, created_at)))
+
+    return sale_id
+
+
+def book_stock(conn, first_sale_id, last_sale_id):
+    """Bucht den Lagerbestand für alle Verkäufe im ID-Bereich in einem Statement ab"""
+    if first_sale_id == last_sale_id:
+        # Einzelner Verkauf: (sale_id, product_id) trifft idx_sale_items_sale direkt
+        sale_filter = 'si.sale_id = ?1 AND si.product_id = products.id'
+    else:
+        # "+" hält SQLite vom Index auf product_id ab, der die ganze
+        # Verkaufshistorie des Produkts lesen würde
+        sale_filter = 'si.sale_id BETWEEN ?1 AND ?2 AND +si.product_id = products.id'
+    conn.execute(f'''
+        UPDATE products
+        SET stock = stock - (SELECT SUM(si.quantity) FROM sale_items si WHERE {sale_filter})
+        WHERE id IN (SELECT product_id FROM sale_items WHERE sale_id BETWEEN ?1 AND ?2)
+    ''', (first_sale_id, last_sale_id))
+
+
+def publish_sale(sale_id, data):
+    """Meldet einen neuen Verkauf an die verbundenen Clients"""
+    broker.publish('sale-created', {
+        'id': sale_id,
+        'total_amount': data['total_amount'],
+        'payment_method': data['payment_method'],
+        'cashier': data.get('cashier', 'System'),
+        'item_count': len(data['items'])
+    })
+
+
+def insert_sale(conn, data, enqueue_print=False, render_receipt=None):
+    """
+    Legt einen Verkauf an und bucht den Lagerbestand ab
+    :param data: Verkaufsdaten wie von POST /api/sales
+    :param enqueue_print: Druckauftrag für den Beleg in print_jobs anlegen
+    :param render_receipt: Funktion(Belegdaten) -> Bytes; der Beleg wird
+                           dann in receipts gespeichert
+    :return: ID des neuen Verkaufs
+    :raises ValueError: wenn der Warenkorb unbekannte Produkte enthält
+    """
+    items = data['items']
+
+    # Schreibsperre gleich zu Beginn holen, damit die Transaktion nicht
+    # mitten im Warenkorb auf einen anderen Schreiber warten muss
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        unknown = find_unknown_products(conn, [item['product_id'] for item in items])
+        if unknown:
+            raise ValueError(f"Unbekannte Produkte: {', '.join(str(i) for i in unknown)}")
+
+        sale_id = write_sale(conn, data, render_receipt=render_receipt)
+        # Lagerbestand für den ganzen Warenkorb in einem Statement abbuchen
+        book_stock(conn, sale_id, sale_id)
+
+        if enqueue_print:
+            PrintQueue.enqueue(conn, sale_id)
+
+        # Lagerbestand hat sich geändert: neue Katalogversion
+        version = record_changes(conn, [item['product_id'] for item in items], 'update')
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # Neue Lagerbestände in den Produktkatalog übernehmen und an die Kassen melden;
+    # die Mengen sind bekannt, die Produkte müssen nicht neu gelesen werden
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    catalog.book_sale(conn, version, quantities)
+    publish_product_changes(quantities, 'stock-changed')
+    publish_sale(sale_id, data)
+    return sale_id
+
+
+def is_number(value):
+    """True für int und float, aber nicht für bool"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_batch_sale(data):
+    """
+    Prüft einen Verkauf aus einem Offline-Stapel
+    :return: (client_id, created_at)
+    :raises ValueError: mit deutscher Fehlermeldung
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Verkauf ist kein Objekt')
+    client_id = data.get('client_id')
+    if not isinstance(client_id, str) or not 1 <= len(client_id) <= MAX_CLIENT_ID_LENGTH:
+        raise ValueError('client_id fehlt')
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('Verkauf ohne Positionen')
+    for field in ('total_amount', 'payment_method'):
+        if data.get(field) is None:
+            raise ValueError(f'{field} fehlt')
+    if not is_number(data['total_amount']):
+        raise ValueError('total_amount muss eine Zahl sein')
+    if not isinstance(data['payment_method'], str):
+        raise ValueError('payment_method muss ein Text sein')
+    for item in items:
+        if not isinstance(item, dict) or any(
+            item.get(field) is None
+            for field in ('product_id', 'quantity', 'unit_price', 'total_price')
+        ):
+            raise ValueError('Unvollständige Position')
+        # Fehlerhafte Werte hier abweisen; in write_sale würden sie den ganzen Stapel abbrechen
+        if not isinstance(item['product_id'], int) or isinstance(item['product_id'], bool):
+            raise ValueError('product_id muss eine ganze Zahl sein')
+        for field in ('quantity', 'unit_price', 'total_price'):
+            if not is_number(item[field]):
+                raise ValueError(f'{field} muss eine Zahl sein')
+        if item['quantity'] <= 0:
+            raise ValueError('quantity muss größer als 0 sein')
+
+    created_at = data.get('created_at')
+    if created_at is not None:
+        try:
+            created_at = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            raise ValueError('created_at muss im Format YYYY-MM-DD HH:MM:SS (UTC) sein')
+    return client_id, created_at
+
+
+def insert_sales_batch(conn, sales, render_receipt=None):
+    """
+    Legt offline erfasste Verkäufe in einer Transaktion an
+    Jeder Verkauf trägt eine client_id; bereits übertragene Verkäufe werden
+    übersprungen, sodass ein Stapel gefahrlos wiederholt gesendet werden kann.
+    Fehlerhafte Verkäufe werden abgewiesen, ohne den Rest aufzuhalten.
+    :param sales: Liste von Verkaufsdaten wie von POST /api/sales plus client_id
+                  und optional created_at
+    :return: Liste mit einem Ergebnis pro Verkauf (status created, duplicate
+             oder rejected)
+    :raises ValueError: bei zu großem Stapel
+    """
+    if len(sales) > MAX_BATCH_SIZE:
+        raise ValueError(f'Höchstens {MAX_BATCH_SIZE} Verkäufe pro Stapel')
+
+    results = []
+    accepted = []
+    for data in sales:
+        try:
+            client_id, created_at = check_batch_sale(data)
+        except ValueError as e:
+            client_id = data.get('client_id') if isinstance(data, dict) else None
+            results.append({'client_id': client_id, 'status': 'rejected', 'error': str(e)})
+            continue
+        result = {'client_id': client_id}
+        results.append(result)
+        accepted.append((result, data, created_at))
+
+    created = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        client_ids = sorted({result['client_id'] for result, _, _ in accepted})
+        existing = {}
+        if client_ids:
+            placeholders = ', '.join('?' * len(client_ids))
+            existing = dict(conn.execute(
+                f'SELECT client_id, id FROM sales WHERE client_id IN ({placeholders})', client_ids
+            ).fetchall())
+        unknown = set(find_unknown_products(
+            conn, [item['product_id'] for _, data, _ in accepted for item in data['items']]
+        ))
+
+        for result, data, created_at in accepted:
+            client_id = result['client_id']
+            if client_id in existing:
+                result.update(status='duplicate', sale_id=existing[client_id])
+                continue
+            missing = sorted({item['product_id'] for item in data['items']} & unknown)
+            if missing:
+                result.update(status='rejected',
+                              error=f"Unbekannte Produkte: {', '.join(str(i) for i in missing)}")
+                continue
+            sale_id = write_sale(conn, data, client_id, created_at, render_receipt)
+            # Doppelte client_id innerhalb desselben Stapels
+            existing[client_id] = sale_id
+            result.update(status='created', sale_id=sale_id)
+            created.append((sale_id, data))
+
+        product_ids = sorted({item['product_id'] for _, data in created for item in data['items']})
+        if created:
+            # Lagerbestand für alle neuen Verkäufe auf einmal abbuchen
+            book_stock(conn, created[0][0], created[-1][0])
+            record_changes(conn, product_ids, 'update')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if created:
+        catalog.refresh(conn, product_ids)
+        publish_product_changes(product_ids, 'stock-changed')
+        for sale_id, data in created:
+            publish_sale(sale_id, data)
+    return results
+
+
+def query_sales(conn, before_id=None, limit=100, date_from=None, date_to=None,
+                cashier=None, payment_method=None):
+    """
+    Liest eine Seite der Verkaufsliste, neueste Verkäufe zuerst
+    Blättern erfolgt per Cursor (before_id = ID des letzten Verkaufs der
+    vorherigen Seite), damit jede Seite gleich viel kostet
+    :param date_from: erstes Datum (YYYY-MM-DD), inklusive
+    :param date_to: letztes Datum (YYYY-MM-DD), inklusive
+    :raises ValueError: bei ungültigen Parametern
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit muss zwischen 1 und {MAX_PAGE_SIZE} liegen')
+
+    conditions = []
+    params = []
+
+    if before_id is not None:
+        row = conn.execute('SELECT created_at FROM sales WHERE id = ?', (before_id,)).fetchone()
+        if row is None:
+            raise ValueError('Unbekannter Verkauf in before_id')
+        conditions.append('(s.created_at, s.id) < (?, ?)')
+        params.extend([row[0], before_id])
+    if date_from:
+        conditions.append('s.created_at >= ?')
+        params.append(day_range(date_from)[0])
+    if date_to:
+        conditions.append('s.created_at < ?')
+        params.append(day_range(date_to)[1])
+    if cashier:
+        conditions.append('s.cashier = ?')
+        params.append(cashier)
+    if payment_method:
+        conditions.append('s.payment_method = ?')
+        params.append(payment_method)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    params.append(limit)
+
+    return conn.execute(f'''
+        SELECT s.id, s.total_amount, s.payment_method, s.created_at, s.cashier, s.printed,
+               s.item_count, s.total_quantity
+        FROM sales s
+        {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT ?
+    ''', params).fetchall()
+
+
+def sales_query_args(args):
+    """Liest die Filter für query_sales aus den Query-Parametern einer Anfrage"""
+    return {
+        'before_id': args.get('before_id', type=int),
+        'limit': args.get('limit', 100, type=int),
+        'date_from': args.get('from'),
+        'date_to': args.get('to'),
+        'cashier': args.get('cashier'),
+        'payment_method': args.get('payment_method'),
+    }
+
+
+# Flask Integration
+def add_sales_routes(app, render_receipt=None):
+    """
+    Fügt die Stapel-Route für offline erfasste Verkäufe zur Flask App hinzu
+    :param render_receipt: wie bei insert_sale; Belege werden gespeichert,
+                           aber nicht gedruckt
+    """
+    @app.route('/api/sales/batch', methods=['POST'])
+    def create_sales_batch():
+        data = request.get_json(silent=True) or {}
+        sales = data.get('sales')
+        if not isinstance(sales, list):
+            return jsonify({'success': False, 'error': 'sales muss eine Liste sein'}), 400
+        try:
+            results = insert_sales_batch(get_db(), sales, render_receipt)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'results': results})
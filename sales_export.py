@@ -0,0 +1,131 @@
+"""
+Export der Verkäufe mit allen Positionen als CSV oder NDJSON
+Eine einzige Abfrage liefert Verkäufe und Positionen sortiert; der Cursor
+wird während der Antwort abgearbeitet, sodass der Speicherbedarf unabhängig
+vom Zeitraum ist.
+"""
+import csv
+import json
+
+from flask import request, stream_with_context
+
+from database import day_range, get_db
+
+# So viele Zeilen werden pro Schreibvorgang an den Client gesendet
+ROWS_PER_CHUNK = 500
+
+CSV_COLUMNS = [
+    'sale_id', 'created_at', 'cashier', 'payment_method', 'total_amount',
+    'product_id', 'product_name', 'quantity', 'unit_price', 'total_price'
+]
+
+
+def iter_sale_rows(conn, date_from=None, date_to=None):
+    """
+    Liefert Verkäufe verbunden mit ihren Positionen, älteste zuerst
+    Verkäufe ohne Positionen erscheinen einmal mit leeren Positionsfeldern
+    :raises ValueError: bei ungültigem Datum
+    """
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append('s.created_at >= ?')
+        params.append(day_range(date_from)[0])
+    if date_to:
+        conditions.append('s.created_at < ?')
+        params.append(day_range(date_to)[1])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    return conn.execute(f'''
+        SELECT s.id, s.created_at, s.cashier, s.payment_method, s.total_amount,
+               si.product_id, p.name, si.quantity, si.unit_price, si.total_price
+        FROM sales s
+        LEFT JOIN sale_items si ON si.sale_id = s.id
+        LEFT JOIN products p ON p.id = si.product_id
+        {where}
+        ORDER BY s.created_at, s.id, si.id
+    ''', params)
+
+
+class _Passthrough:
+    """Dateiersatz für csv.writer: writerow gibt die fertige Zeile zurück"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows):
+    """Wandelt Zeilen in CSV-Text um, ROWS_PER_CHUNK Zeilen pro Stück"""
+    writer = csv.writer(_Passthrough())
+    chunk = [writer.writerow(CSV_COLUMNS)]
+    for row in rows:
+        chunk.append(writer.writerow(tuple(row)))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def ndjson_chunks(rows):
+    """
+    Fasst die Zeilen zu einem JSON-Objekt pro Verkauf mit seinen Positionen zusammen
+    Die Zeilen sind nach Verkauf sortiert, daher ist immer nur ein Verkauf im Speicher
+    """
+    chunk = []
+    sale = None
+    for row in rows:
+        if sale is None or sale['id'] != row[0]:
+            if sale is not None:
+                chunk.append(json.dumps(sale, ensure_ascii=False) + '\n')
+                if len(chunk) >= ROWS_PER_CHUNK:
+                    yield ''.join(chunk)
+                    chunk = []
+            sale = {
+                'id': row[0],
+                'created_at': row[1],
+                'cashier': row[2],
+                'payment_method': row[3],
+                'total_amount': row[4],
+                'items': []
+            }
+        if row[5] is not None:
+            sale['items'].append({
+                'product_id': row[5],
+                'product_name': row[6],
+                'quantity': row[7],
+                'unit_price': row[8],
+                'total_price': row[9]
+            })
+    if sale is not None:
+        chunk.append(json.dumps(sale, ensure_ascii=False) + '\n')
+    if chunk:
+        yield ''.join(chunk)
+
+
+# Flask Integration
+def add_export_routes(app):
+    """
+    Fügt die Export-Route zur Flask App hinzu
+    """
+    @app.route('/api/export/sales')
+    def export_sales():
+        fmt = request.args.get('format', 'csv')
+        if fmt not in ('csv', 'ndjson'):
+            return {'error': 'format muss csv oder ndjson sein'}, 400
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        try:
+            rows = iter_sale_rows(get_db(), date_from, date_to)
+        except ValueError:
+            return {'error': 'Ungültiges Datum'}, 400
+
+        if fmt == 'csv':
+            chunks, mimetype = csv_chunks(rows), 'text/csv'
+        else:
+            chunks, mimetype = ndjson_chunks(rows), 'application/x-ndjson'
+
+        filename = f"verkaeufe_{date_from or 'anfang'}_{date_to or 'heute'}.{fmt}"
+        response = app.response_class(stream_with_context(chunks), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,232 @@
+"""
+Protokoll langsamer SQL-Abfragen
+Jede Abfrage, die länger als KASSENSYSTEM_SLOW_QUERY_MS (Standard 100 ms)
+braucht, wird mit Parametern, Dauer, aufrufender Route und dem Ergebnis von
+EXPLAIN QUERY PLAN als JSON-Zeile in eine rotierende Logdatei geschrieben
+(KASSENSYSTEM_SLOW_QUERY_LOG, Standard slow_queries.log). Pläne, die eine
+Tabelle ohne Index komplett lesen, werden markiert.
+
+Gemessen wird über die instrumentierten Verbindungen aus metrics.py; mit
+KASSENSYSTEM_METRICS=0 ist auch dieses Protokoll aus. Schnelle Abfragen
+kosten nur einen Vergleich, der Plan wird pro Anweisung nur einmal ermittelt.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, jsonify, request
+
+import metrics
+
+THRESHOLD_ENV = 'KASSENSYSTEM_SLOW_QUERY_MS'
+LOG_ENV = 'KASSENSYSTEM_SLOW_QUERY_LOG'
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_LOG_PATH = 'slow_queries.log'
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# Höchstens so viele verschiedene Anweisungen werden zusammengefasst
+MAX_STATEMENTS = 500
+DEFAULT_TOP = 20
+MAX_TOP = 100
+
+_SCAN_PATTERN = re.compile(r'SCAN (\S+)(.*)')
+
+
+def normalize_sql(sql):
+    """Fasst Leerraum zusammen, damit gleiche Anweisungen gleich aussehen"""
+    return ' '.join(sql.split())
+
+
+def query_plan(conn, sql, parameters):
+    """
+    Ermittelt den Plan einer Anweisung als eingerückte Zeilen
+    Läuft an der Instrumentierung vorbei, damit er selbst nicht gemessen wird
+    :return: Liste der Planzeilen, leer wenn es keinen Plan gibt (z.B. BEGIN)
+    """
+    try:
+        rows = sqlite3.Connection.execute(
+            conn, 'EXPLAIN QUERY PLAN ' + sql, () if parameters is None else parameters
+        ).fetchall()
+    except sqlite3.Error:
+        return []
+    depth = {0: -1}
+    plan = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        plan.append('  ' * depth[node] + detail)
+    return plan
+
+
+def full_scans(plan):
+    """
+    Gibt die Tabellen zurück, die laut Plan ohne Index komplett gelesen werden
+    Zwischenergebnisse von Unterabfragen (MATERIALIZE / CO-ROUTINE) zählen nicht
+    """
+    details = [line.strip() for line in plan]
+    subqueries = {
+        detail.split(' ', 1)[1] for detail in details
+        if detail.startswith(('MATERIALIZE ', 'CO-ROUTINE '))
+    }
+    tables = []
+    for detail in details:
+        match = _SCAN_PATTERN.fullmatch(detail)
+        if (match and match[1] != 'CONSTANT' and match[1] not in subqueries
+                and 'USING' not in match[2] and 'VIRTUAL TABLE' not in match[2]):
+            tables.append(match[1])
+    return tables
+
+
+def current_route():
+    """Route der laufenden Anfrage, z.B. "GET /api/sales/<int:sale_id>" """
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return f'{request.method} {rule}'
+
+
+def loggable(parameters):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: loggable_value(value) for key, value in parameters.items()}
+    return [loggable_value(value) for value in parameters]
+
+
+def loggable_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<{len(value)} Bytes>'
+    return value
+
+
+class SlowQueryLog:
+    """
+    Schreibt langsame Abfragen ins Protokoll und fasst sie je Anweisung
+    zusammen, damit sich die schlimmsten abrufen lassen
+    """
+
+    def __init__(self, path, threshold_ms):
+        """
+        :param path: Pfad der Logdatei (rotiert bei MAX_LOG_BYTES)
+        :param threshold_ms: Abfragen ab dieser Dauer werden protokolliert
+        """
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.logger = logging.getLogger('kassensystem.slow_queries')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._installed = False
+
+    def install(self):
+        """Hängt das Protokoll an die instrumentierten Verbindungen"""
+        with self._lock:
+            if self._installed:
+                return
+            handler = RotatingFileHandler(self.path, maxBytes=MAX_LOG_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self._installed = True
+        metrics.slow_query_seconds = self.threshold_ms / 1000
+        metrics.slow_query_handler = self.record
+
+    def record(self, conn, name, sql, parameters, seconds):
+        """Protokolliert eine langsame Abfrage; Fehler dabei werden nur geloggt"""
+        try:
+            self._record(conn, name, normalize_sql(sql), parameters, seconds)
+        except Exception:
+            logging.getLogger(__name__).exception('Langsame Abfrage konnte nicht protokolliert werden')
+
+    def _record(self, conn, name, sql, parameters, seconds):
+        now = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+        route = current_route()
+        logged_parameters = loggable(parameters)
+        duration_ms = round(seconds * 1000, 3)
+
+        with self._lock:
+            statement = self._statements.get((name, sql))
+        if statement is None:
+            plan = query_plan(conn, sql, parameters)
+            statement = {
+                'query': name,
+                'sql': sql,
+                'plan': plan,
+                'full_scans': full_scans(plan),
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+            }
+            with self._lock:
+                if len(self._statements) < MAX_STATEMENTS:
+                    statement = self._statements.setdefault((name, sql), statement)
+
+        with self._lock:
+            statement['count'] += 1
+            statement['total_ms'] += duration_ms
+            statement['max_ms'] = max(statement['max_ms'], duration_ms)
+            statement['last_seen'] = now
+            statement['last_route'] = route
+            statement['last_parameters'] = logged_parameters
+
+        self.logger.warning(json.dumps({
+            'time': now,
+            'duration_ms': duration_ms,
+            'query': name,
+            'route': route,
+            'thread': threading.current_thread().name,
+            'sql': sql,
+            'parameters': logged_parameters,
+            'plan': statement['plan'],
+            'full_scan': bool(statement['full_scans']),
+            'full_scans': statement['full_scans'],
+        }, ensure_ascii=False, default=str))
+
+    def top(self, limit=DEFAULT_TOP, sort='total'):
+        """
+        Gibt die schlimmsten Anweisungen zurück
+        :param sort: 'total' (Gesamtzeit), 'max' (längste Einzeldauer) oder 'count'
+        """
+        key = {'total': 'total_ms', 'max': 'max_ms', 'count': 'count'}[sort]
+        with self._lock:
+            statements = [dict(statement) for statement in self._statements.values()]
+        statements.sort(key=lambda statement: statement[key], reverse=True)
+        for statement in statements:
+            statement['total_ms'] = round(statement['total_ms'], 3)
+            statement['avg_ms'] = round(statement['total_ms'] / statement['count'], 3)
+            statement['full_scan'] = bool(statement['full_scans'])
+        return statements[:limit]
+
+
+slow_query_log = SlowQueryLog(
+    os.environ.get(LOG_ENV, DEFAULT_LOG_PATH),
+    float(os.environ.get(THRESHOLD_ENV, DEFAULT_THRESHOLD_MS))
+)
+
+
+# Flask Integration
+def add_slow_query_routes(app):
+    """
+    Schaltet das Protokoll langsamer Abfragen ein und fügt die Übersicht hinzu
+    """
+    slow_query_log.install()
+
+    @app.route('/api/admin/slow-queries')
+    def slow_queries():
+        limit = request.args.get('limit', DEFAULT_TOP, type=int)
+        sort = request.args.get('sort', 'total')
+        if not 1 <= limit <= MAX_TOP:
+            return jsonify({'error': f'limit muss zwischen 1 und {MAX_TOP} liegen'}), 400
+        if sort not in ('total', 'max', 'count'):
+            return jsonify({'error': 'sort muss total, max oder count sein'}), 400
+
+        return jsonify({
+            'threshold_ms': slow_query_log.threshold_ms,
+            'log_file': slow_query_log.path,
+            'statements': slow_query_log.top(limit, sort)
+        })
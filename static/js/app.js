@@ -1,6 +1,8 @@
 // Global variables
 let cart = [];
 let products = [];
+let productsETag = null;
+let catalogVersion = null;
 let currentPaymentMethod = 'Bargeld';
 
 // Initialize app
@@ -9,6 +11,7 @@ document.addEventListener('DOMContentLoaded', function() {
     loadRecentSales();
     updateTime();
     setupEventListeners();
+    subscribeToEvents();
     
     // Update time every second
     setInterval(updateTime, 1000);
@@ -59,9 +62,19 @@ function setupEventListeners() {
 // Load products from server
 async function loadProducts() {
     try {
-        const response = await fetch('/api/products');
+        // Nach dem ersten Laden nur noch die Änderungen abholen
+        if (catalogVersion !== null && await syncProductChanges()) return;
+        
+        // Katalogversion mitschicken: 304 = Produktliste unverändert
+        const headers = productsETag ? { 'If-None-Match': productsETag } : {};
+        const response = await fetch('/api/products', { headers, cache: 'no-store' });
+        if (response.status === 304) return;
+        
         const data = await response.json();
         products = data;
+        productsETag = response.headers.get('ETag');
+        catalogVersion = parseInt(response.headers.get('X-Catalog-Version'), 10);
+        if (isNaN(catalogVersion)) catalogVersion = null;
         displayQuickProducts();
         updateProductTable();
     } catch (error) {
@@ -70,10 +83,98 @@ async function loadProducts() {
     }
 }
 
-// Display quick access products
-function displayQuickProducts() {
+// Fetch catalog changes since the known version
+async function syncProductChanges() {
+    const response = await fetch(`/api/products/changes?since=${catalogVersion}`, { cache: 'no-store' });
+    if (!response.ok) return false;
+    
+    const changes = await response.json();
+    if (changes.reset) return false;  // Protokoll reicht nicht zurück: alles neu laden
+    
+    applyProductChanges(changes);
+    return true;
+}
+
+// Apply catalog deltas to the local products array
+function applyProductChanges(changes) {
+    if (changes.version <= catalogVersion) return;
+    catalogVersion = changes.version;
+    if (changes.products.length === 0 && changes.deleted.length === 0) return;
+    
+    const deleted = new Set(changes.deleted);
+    const changed = new Map(changes.products.map(product => [product.id, product]));
+    
+    products = products.filter(product => !deleted.has(product.id) && !changed.has(product.id));
+    products.push(...changed.values());
+    products.sort((a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0));
+    
+    // Gespeicherte Liste ist veraltet, ETag nicht mehr mitschicken
+    productsETag = null;
+    displayQuickProducts();
+    updateProductTable();
+}
+
+// Live updates from the server (Server-Sent Events)
+function subscribeToEvents() {
+    if (!window.EventSource) return;
+    const source = new EventSource('/api/events');
+    
+    const onProductEvent = event => {
+        if (catalogVersion === null) return;
+        const changes = JSON.parse(event.data);
+        if (changes.version > catalogVersion + 1) {
+            // Ereignisse verpasst: Änderungen seit der bekannten Version nachladen
+            loadProducts();
+        } else {
+            applyProductChanges(changes);
+        }
+    };
+    source.addEventListener('product-changed', onProductEvent);
+    source.addEventListener('stock-changed', onProductEvent);
+    source.addEventListener('sale-created', () => loadRecentSales());
+    source.addEventListener('printer-status', event => updatePrinterStatus(JSON.parse(event.data)));
+    loadPrinterStatus();
+    
+    // Nach einem Verbindungsabbruch verbindet EventSource selbst neu;
+    // dann verpasste Änderungen einmal nachholen
+    let connected = false;
+    source.addEventListener('open', () => {
+        if (connected && catalogVersion !== null) loadProducts();
+        connected = true;
+    });
+}
+
+// Druckerstatus aus dem PrinterMonitor; gemeldet wird nur ein Wechsel online/offline
+let printerOnline = null;
+
+function updatePrinterStatus(snapshot) {
+    const online = Boolean(snapshot.status && snapshot.status.online);
+    if (printerOnline !== null && online !== printerOnline) {
+        if (online) {
+            showNotification('Drucker wieder bereit', 'success');
+        } else {
+            const reason = snapshot.status && snapshot.status.error ? `: ${snapshot.status.error}` : '';
+            showNotification(`Drucker nicht erreichbar${reason}`, 'error');
+        }
+    }
+    printerOnline = online;
+}
+
+// Ausgangsstand holen, damit schon der erste Wechsel gemeldet wird (nur mit Drucker-Support)
+async function loadPrinterStatus() {
+    try {
+        const response = await fetch('/api/printer/status');
+        if (!response.ok) return;
+        const data = await response.json();
+        if (printerOnline === null) printerOnline = Boolean(data.printer && data.printer.online);
+    } catch (error) {
+        // Ohne Drucker-Support gibt es keinen Status
+    }
+}
+
+// Display quick access products (or search results)
+function displayQuickProducts(quickProducts = products.slice(0, 8)) {
     const container = document.getElementById('quickProducts');
-    const quickProducts = products.slice(0, 8); // Show first 8 products
     
     container.innerHTML = quickProducts.map(product => `
         <button class="product-quick-btn" onclick="addToCart(${product.id})">
@@ -83,20 +184,24 @@ function displayQuickProducts() {
     `).join('');
 }
 
-// Search product by barcode
+// Search product by barcode, otherwise by name
 async function searchProduct() {
     const barcode = document.getElementById('barcodeInput').value.trim();
-    if (!barcode) return;
+    if (!barcode) {
+        displayQuickProducts();
+        return;
+    }
     
     try {
-        const response = await fetch(`/api/products/search/${barcode}`);
+        const response = await fetch(`/api/products/search/${encodeURIComponent(barcode)}`);
         const data = await response.json();
         
         if (data.success) {
             addToCart(data.product.id);
             document.getElementById('barcodeInput').value = '';
+            displayQuickProducts();
         } else {
-            showNotification('Produkt nicht gefunden', 'error');
+            await searchProductsByName(barcode);
         }
     } catch (error) {
         console.error('Error searching product:', error);
@@ -104,6 +209,21 @@ async function searchProduct() {
     }
 }
 
+// Name search on the server (FTS index, tolerates typos)
+async function searchProductsByName(query) {
+    const response = await fetch(`/api/products/search?q=${encodeURIComponent(query)}&limit=8`);
+    const data = await response.json();
+    
+    if (!response.ok || data.results.length === 0) {
+        showNotification('Produkt nicht gefunden', 'error');
+        return;
+    }
+    if (data.fuzzy) {
+        showNotification('Keine exakten Treffer, ähnliche Produkte angezeigt', 'info');
+    }
+    displayQuickProducts(data.results);
+}
+
 // Add product to cart
 function addToCart(productId) {
     const product = products.find(p => p.id === productId);
@@ -278,6 +398,10 @@ async function completeSale() {
         cashier: 'Kassierer',
         items: cart
     };
+    if (currentPaymentMethod === 'Bargeld') {
+        // Für den Beleg (Erhalten / Rückgeld)
+        saleData.received_amount = parseFloat(document.getElementById('receivedAmount').value) || total;
+    }
     
     try {
         const response = await fetch('/api/sales', {
@@ -370,7 +494,7 @@ function showReceipt(saleId, total) {
 // Load recent sales
 async function loadRecentSales() {
     try {
-        const response = await fetch('/api/sales');
+        const response = await fetch('/api/sales?limit=5');
         const sales = await response.json();
         
         const container = document.getElementById('recentSales');
@@ -0,0 +1,286 @@
+"""
+Synthetische Verkaufshistorie für Benchmarks und Abfrageplan-Analysen
+Füllt products, sales und sale_items mit realistisch verteilten Daten über
+mehrere Jahre:
+
+- Kundenzahl je Tag nach Wochentag, Monat (Weihnachtsgeschäft) und Wachstum,
+  sonntags und an Feiertagen geschlossen
+- Uhrzeiten nach Stoßzeiten (Mittag, Feierabend)
+- meist kleine Warenkörbe, beliebte Produkte werden häufiger gekauft
+- Bargeld bei kleinen Beträgen häufiger, Karte und Kontaktlos nehmen über
+  die Jahre zu
+- Kassierer in Früh- und Spätschicht
+
+Gleiche Parameter und gleicher Seed ergeben exakt dieselben Daten. Für die
+Dauer des Imports werden die Indizes auf sales und sale_items entfernt und
+danach neu angelegt, die Tageswerte werden am Ende neu aufgebaut.
+
+Aufruf (Datenbank wie üblich über KASSENSYSTEM_DB):
+    KASSENSYSTEM_DB=gross.db python synthetic_data.py --years 3 --customers-per-day 800
+"""
+import argparse
+import itertools
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from database import INDEXES, get_db, upgrade_schema
+from reports import rebuild_rollups
+
+# Fester Standard statt heute, damit derselbe Aufruf immer dieselben Daten ergibt
+DEFAULT_END = '2025-12-31'
+
+# Kategorie: (Preis von, Preis bis, Anteil am Sortiment, Produktnamen)
+CATEGORIES = {
+    'Obst': (0.29, 4.99, 8, ['Äpfel', 'Bananen', 'Birnen', 'Trauben', 'Orangen', 'Erdbeeren', 'Kiwis']),
+    'Gemüse': (0.39, 3.99, 8, ['Tomaten', 'Gurken', 'Paprika', 'Karotten', 'Zwiebeln', 'Kartoffeln', 'Salat']),
+    'Backwaren': (0.35, 4.49, 7, ['Brötchen', 'Vollkornbrot', 'Baguette', 'Croissant', 'Brezel', 'Toast']),
+    'Molkereiprodukte': (0.49, 6.99, 10, ['Milch', 'Joghurt', 'Butter', 'Quark', 'Käse', 'Sahne', 'Skyr']),
+    'Getränke': (0.39, 12.99, 12, ['Mineralwasser', 'Apfelsaft', 'Orangensaft', 'Cola', 'Limonade',
+                                  'Eistee', 'Bier', 'Kaffee', 'Tee']),
+    'Süßwaren': (0.49, 5.99, 10, ['Schokolade', 'Gummibärchen', 'Kekse', 'Pralinen', 'Riegel', 'Lakritz']),
+    'Snacks': (0.99, 4.49, 6, ['Chips', 'Salzstangen', 'Erdnüsse', 'Cracker', 'Popcorn']),
+    'Grundnahrung': (0.59, 7.99, 10, ['Nudeln', 'Reis', 'Mehl', 'Zucker', 'Haferflocken', 'Müsli', 'Linsen']),
+    'Tiefkühl': (1.29, 8.99, 6, ['Pizza', 'Spinat', 'Fischstäbchen', 'Pommes', 'Eiscreme']),
+    'Drogerie': (0.79, 9.99, 8, ['Zahnpasta', 'Shampoo', 'Duschgel', 'Seife', 'Taschentücher']),
+    'Haushalt': (0.99, 14.99, 5, ['Spülmittel', 'Müllbeutel', 'Küchenrolle', 'Batterien', 'Kerzen']),
+}
+BRANDS = ['Alpenhof', 'Bergquell', 'Sonnenfeld', 'Nordlicht', 'Landliebe', 'Gutsherr', 'Müllerhof',
+          'Rheintal', 'Hansetaler', 'Waldmeister', 'Eigenmarke', 'Bio-Garten']
+VARIANTS = ['', 'Bio', 'Classic', 'Light', 'Extra', 'Natur', 'Family', 'Mini', 'Premium', 'Regional']
+SIZES = ['100 g', '250 g', '500 g', '1 kg', '0,5 l', '1 l', '1,5 l', '6 Stück', '10 Stück']
+
+# Kundenfaktor je Wochentag (Montag bis Sonntag) und Monat
+WEEKDAY_FACTORS = [0.85, 0.90, 0.95, 1.00, 1.20, 1.35, 0.0]
+MONTH_FACTORS = [0.85, 0.88, 0.95, 1.00, 1.02, 1.00, 0.95, 0.93, 1.00, 1.02, 1.08, 1.30]
+# Geschlossene Tage (Monat, Tag)
+HOLIDAYS = {(1, 1), (5, 1), (10, 3), (12, 25), (12, 26)}
+ANNUAL_GROWTH = 0.04
+DAILY_NOISE = 0.08
+
+# Öffnungszeiten 8 bis 20 Uhr, Gewicht je Stunde
+OPENING_HOURS = list(range(8, 20))
+HOUR_WEIGHTS = [4, 6, 7, 8, 10, 8, 6, 6, 8, 11, 12, 7]
+SHIFT_CHANGE_HOUR = 14
+EARLY_SHIFT = ['Anna', 'Ben', 'Carla']
+LATE_SHIFT = ['David', 'Elif', 'Frank']
+# Stammkräfte sitzen öfter an der Kasse als Aushilfen
+SHIFT_WEIGHTS = [5, 3, 1]
+
+# Artikel je Warenkorb (1 bis 40), meist wenige
+BASKET_SIZES = list(range(1, 41))
+BASKET_WEIGHTS = [22, 16, 13, 10, 8, 6, 5, 4, 3, 3] + [1.2] * 10 + [0.3] * 20
+QUANTITIES = [1, 2, 3, 4, 6]
+QUANTITY_WEIGHTS = [75, 16, 5, 2, 2]
+# Exponent der Zipf-Verteilung für die Beliebtheit der Produkte
+POPULARITY_EXPONENT = 1.05
+# Kontaktlos ohne PIN nur bis zu diesem Betrag
+CONTACTLESS_LIMIT = 50.0
+
+# Anzahl Tage, die gemeinsam geschrieben und committet werden
+DAYS_PER_COMMIT = 31
+
+# Kumulierte Gewichte: random.choices muss sie dann nicht bei jedem Aufruf berechnen
+_HOUR_CUM = list(itertools.accumulate(HOUR_WEIGHTS))
+_SHIFT_CUM = list(itertools.accumulate(SHIFT_WEIGHTS))
+_BASKET_CUM = list(itertools.accumulate(BASKET_WEIGHTS))
+_QUANTITY_CUM = list(itertools.accumulate(QUANTITY_WEIGHTS))
+
+
+def make_products(rng, count, first_id):
+    """Erzeugt Produktzeilen (id, name, price, category, barcode, stock)"""
+    categories = list(CATEGORIES)
+    weights = [CATEGORIES[category][2] for category in categories]
+    rows = []
+    for product_id in range(first_id, first_id + count):
+        category = rng.choices(categories, weights)[0]
+        low, high, _, nouns = CATEGORIES[category]
+        name = ' '.join(part for part in (
+            rng.choice(BRANDS), rng.choice(nouns), rng.choice(VARIANTS), rng.choice(SIZES)
+        ) if part)
+        price = round(rng.uniform(low, high), 2)
+        # Interne EAN-Nummern (Präfix 2) aus der Produkt-ID
+        rows.append((product_id, name, price, category, f'2{product_id:012d}', rng.randint(0, 500)))
+    return rows
+
+
+def customers_on(day, base, first_day, rng):
+    """Anzahl Kunden an einem Tag"""
+    if (day.month, day.day) in HOLIDAYS:
+        return 0
+    factor = WEEKDAY_FACTORS[day.weekday()] * MONTH_FACTORS[day.month - 1]
+    if factor == 0:
+        return 0
+    growth = (1 + ANNUAL_GROWTH) ** ((day - first_day).days / 365.25)
+    return max(0, round(base * factor * growth * rng.gauss(1, DAILY_NOISE)))
+
+
+def payment_method(rng, total, years):
+    """Zahlungsart abhängig von Betrag und Jahr (Karte nimmt zu)"""
+    cash = 0.60 - 0.06 * years
+    if total < 10:
+        cash += 0.15
+    elif total > 50:
+        cash -= 0.20
+    if rng.random() < min(0.9, max(0.1, cash)):
+        return 'Bargeld'
+    contactless = min(0.75, 0.30 + 0.10 * years)
+    if total <= CONTACTLESS_LIMIT and rng.random() < contactless:
+        return 'Kontaktlos'
+    return 'Karte'
+
+
+def generate_day(rng, day, customers, products, years, next_sale_id):
+    """
+    Erzeugt alle Verkäufe eines Tages, nach Uhrzeit sortiert
+    :param products: (IDs, kumulierte Beliebtheit, Preise je ID)
+    :return: (Verkaufszeilen, Positionszeilen)
+    """
+    product_ids, popularity, prices = products
+    hours = rng.choices(OPENING_HOURS, cum_weights=_HOUR_CUM, k=customers)
+    times = sorted(hour * 3600 + int(rng.random() * 3600) for hour in hours)
+    sizes = rng.choices(BASKET_SIZES, cum_weights=_BASKET_CUM, k=customers)
+    midnight = datetime(day.year, day.month, day.day)
+
+    sale_rows = []
+    item_rows = []
+    for sale_id, seconds, size in zip(itertools.count(next_sale_id), times, sizes):
+        basket = dict.fromkeys(rng.choices(product_ids, cum_weights=popularity, k=size))
+        quantities = rng.choices(QUANTITIES, cum_weights=_QUANTITY_CUM, k=len(basket))
+        total = 0.0
+        for product_id, quantity in zip(basket, quantities):
+            price = prices[product_id]
+            line_total = round(price * quantity, 2)
+            item_rows.append((sale_id, product_id, quantity, price, line_total))
+            total += line_total
+        total = round(total, 2)
+
+        shift = EARLY_SHIFT if seconds < SHIFT_CHANGE_HOUR * 3600 else LATE_SHIFT
+        sale_rows.append((
+            sale_id, total, payment_method(rng, total, years),
+            (midnight + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S'),
+            rng.choices(shift, cum_weights=_SHIFT_CUM)[0], len(basket), sum(quantities)
+        ))
+    return sale_rows, item_rows
+
+
+def drop_indexes(conn, tables):
+    """Entfernt die Indizes aus INDEXES auf den angegebenen Tabellen"""
+    for statement in INDEXES:
+        match = re.search(r'EXISTS (\w+)\s+ON (\w+)', statement)
+        if match and match.group(2) in tables:
+            conn.execute(f'DROP INDEX IF EXISTS {match.group(1)}')
+
+
+def generate(conn, first_day, last_day, customers_per_day, product_count, seed, progress=None):
+    """
+    Schreibt Produkte und Verkäufe in die Datenbank
+    :param progress: Funktion(Tag, Verkäufe bisher) für Fortschrittsmeldungen
+    :return: Anzahl (Produkte, Verkäufe, Positionen)
+    :raises ValueError: wenn die Datenbank schon Verkäufe enthält
+    """
+    if conn.execute('SELECT 1 FROM sales LIMIT 1').fetchone():
+        raise ValueError('Die Datenbank enthält bereits Verkäufe')
+    rng = random.Random(seed)
+
+    # Bulk-Modus: kein Journal, keine Indizes während des Schreibens
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    drop_indexes(conn, {'sales', 'sale_items'})
+
+    first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM products').fetchone()[0]
+    conn.executemany(
+        'INSERT INTO products (id, name, price, category, barcode, stock) VALUES (?, ?, ?, ?, ?, ?)',
+        make_products(rng, product_count, first_id)
+    )
+    conn.commit()
+
+    rows = conn.execute('SELECT id, price FROM products ORDER BY id').fetchall()
+    product_ids = [row[0] for row in rows]
+    prices = {row[0]: row[1] for row in rows}
+    # Beliebtheit unabhängig von der Reihenfolge der IDs verteilen
+    ranking = product_ids[:]
+    rng.shuffle(ranking)
+    popularity = list(itertools.accumulate(
+        1 / (rank + 1) ** POPULARITY_EXPONENT for rank in range(len(ranking))
+    ))
+    products = (ranking, popularity, prices)
+
+    sale_count = 0
+    item_count = 0
+    pending_sales = []
+    pending_items = []
+
+    def flush():
+        conn.executemany(
+            'INSERT INTO sales (id, total_amount, payment_method, created_at, cashier, item_count, total_quantity) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', pending_sales
+        )
+        conn.executemany(
+            'INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?, ?)',
+            pending_items
+        )
+        conn.commit()
+        pending_sales.clear()
+        pending_items.clear()
+
+    day = first_day
+    days = 0
+    while day <= last_day:
+        customers = customers_on(day, customers_per_day, first_day, rng)
+        if customers:
+            years = (day - first_day).days / 365.25
+            sale_rows, item_rows = generate_day(rng, day, customers, products, years, sale_count + 1)
+            pending_sales.extend(sale_rows)
+            pending_items.extend(item_rows)
+            sale_count += len(sale_rows)
+            item_count += len(item_rows)
+        days += 1
+        if days % DAYS_PER_COMMIT == 0:
+            flush()
+            if progress:
+                progress(day, sale_count)
+        day += timedelta(days=1)
+    flush()
+
+    # Indizes, Tageswerte und Statistiken für den Query-Planer
+    upgrade_schema(conn)
+    rebuild_rollups(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.execute('PRAGMA journal_mode = WAL')
+    return product_count, sale_count, item_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Erzeugt eine synthetische Verkaufshistorie')
+    parser.add_argument('--years', type=float, default=3, help='Zeitraum in Jahren bis --end')
+    parser.add_argument('--end', default=DEFAULT_END, help=f'Letzter Tag (YYYY-MM-DD), Standard {DEFAULT_END}')
+    parser.add_argument('--customers-per-day', type=int, default=800,
+                        help='Kunden an einem durchschnittlichen Tag zu Beginn')
+    parser.add_argument('--products', type=int, default=5000, help='Anzahl zusätzlicher Produkte')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Schema wie beim Start der App anlegen
+    from app import init_db
+    init_db()
+
+    last_day = date.fromisoformat(args.end)
+    first_day = last_day - timedelta(days=round(args.years * 365.25) - 1)
+    started = time.perf_counter()
+
+    def report(day, sales):
+        elapsed = time.perf_counter() - started
+        print(f'  {day.isoformat()}: {sales:,} Verkäufe ({sales / elapsed:,.0f}/s)', file=sys.stderr)
+
+    try:
+        products, sales, items = generate(
+            get_db(), first_day, last_day, args.customers_per_day, args.products, args.seed, report
+        )
+    except ValueError as e:
+        sys.exit(f'❌ {e}')
+    print(f'✅ {products:,} Produkte, {sales:,} Verkäufe, {items:,} Positionen '
+          f'({first_day.isoformat()} bis {last_day.isoformat()}) in {time.perf_counter() - started:.1f}s')
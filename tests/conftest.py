@@ -0,0 +1,29 @@
+"""
+Gemeinsame Einstellungen für die Tests
+Die Module lesen Datenbankpfad und Drucker beim Import aus der Umgebung,
+deshalb wird beides hier vor dem ersten Import gesetzt.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix='kassensystem-tests-')
+os.environ['KASSENSYSTEM_DB'] = os.path.join(_tmp, 'kassensystem.db')
+os.environ['KASSENSYSTEM_PRINTER'] = 'virtual://'
+os.environ['KASSENSYSTEM_SLOW_QUERY_LOG'] = os.path.join(_tmp, 'slow_queries.log')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def printer_app():
+    """app_with_printer mit Beispieldaten in einer temporären Datenbank"""
+    import app_with_printer
+    app_with_printer.init_db()
+    return app_with_printer
+
+
+@pytest.fixture
+def client(printer_app):
+    return printer_app.app.test_client()
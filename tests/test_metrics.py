@@ -0,0 +1,53 @@
+import pytest
+from flask import Flask
+
+import metrics
+
+
+def make_app():
+    app = Flask(__name__)
+    metrics.add_metrics_routes(app)
+
+    @app.route('/kaputt/<int:number>')
+    def broken(number):
+        raise RuntimeError('kaputt')
+
+    return app
+
+
+def request_count(client, route, status):
+    text = client.get('/api/metrics').get_data(as_text=True)
+    prefix = f'kassensystem_http_requests_total{{route="{route}",method="GET",status="{status}"}} '
+    return next((int(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix)), 0)
+
+
+def duration_count(client, route):
+    text = client.get('/api/metrics').get_data(as_text=True)
+    prefix = f'kassensystem_http_request_duration_seconds_count{{route="{route}",method="GET"}} '
+    return next((int(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix)), 0)
+
+
+@pytest.mark.parametrize('propagate', [False, True])
+def test_unhandled_error_is_counted_as_500(propagate):
+    app = make_app()
+    app.config['PROPAGATE_EXCEPTIONS'] = propagate
+    client = app.test_client()
+    before = request_count(client, '/kaputt/<int:number>', 500)
+    durations = duration_count(client, '/kaputt/<int:number>')
+
+    if propagate:
+        with pytest.raises(RuntimeError):
+            client.get('/kaputt/1')
+    else:
+        assert client.get('/kaputt/1').status_code == 500
+
+    assert request_count(client, '/kaputt/<int:number>', 500) == before + 1
+    assert duration_count(client, '/kaputt/<int:number>') == durations + 1
+
+
+def test_successful_request_is_counted_once():
+    client = make_app().test_client()
+    before = request_count(client, '/api/metrics', 200)
+    client.get('/api/metrics')
+    # Die Abfrage in request_count selbst zählt erst nach ihrer Antwort
+    assert request_count(client, '/api/metrics', 200) == before + 2
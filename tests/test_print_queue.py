@@ -0,0 +1,80 @@
+import sqlite3
+import time
+
+from database import get_db
+
+
+def sale(payment_method='Bargeld'):
+    return {
+        'total_amount': 0.5,
+        'payment_method': payment_method,
+        'items': [{'product_id': 1, 'quantity': 1, 'unit_price': 0.5, 'total_price': 0.5}]
+    }
+
+
+def wait_until_printed(sale_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        row = get_db().execute('SELECT printed FROM sales WHERE id = ?', (sale_id,)).fetchone()
+        if row[0]:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_init_db_starts_background_workers(printer_app, client):
+    assert client.get('/api/print-jobs').get_json()['worker_running'] is True
+    assert printer_app.printer_monitor._thread.is_alive()
+
+    result = client.post('/api/sales', json=sale()).get_json()
+    assert result['print_queued'] is True
+    assert wait_until_printed(result['sale_id'])
+
+
+def test_worker_survives_database_errors(printer_app, client, monkeypatch):
+    queue = printer_app.print_queue
+    process = queue._process
+    calls = []
+
+    def locked_once(job):
+        calls.append(job['sale_id'])
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        process(job)
+
+    monkeypatch.setattr(queue, '_process', locked_once)
+    sale_id = client.post('/api/sales', json=sale()).get_json()['sale_id']
+
+    # Der Auftrag wird freigegeben und erneut versucht, der Thread läuft weiter
+    assert wait_until_printed(sale_id)
+    assert calls.count(sale_id) == 2
+    assert client.get('/api/print-jobs').get_json()['worker_running'] is True
+
+
+def test_drawer_opens_only_on_first_attempt(printer_app, monkeypatch):
+    drawer = []
+    monkeypatch.setattr(printer_app, 'print_sale_receipt',
+                        lambda sale_id, open_drawer=False: drawer.append(open_drawer) or {'success': True})
+
+    printer_app.print_new_sale_receipt(1, 0)
+    printer_app.print_new_sale_receipt(1, 1)
+    assert drawer == [True, False]
+
+
+def test_printer_retry_does_not_open_drawer_again(monkeypatch):
+    from printer_support import PrinterManager
+
+    drawer = []
+
+    class FlakyPrinter:
+        def print_job(self, rendered=None, cut=False, open_drawer=False):
+            drawer.append(open_drawer)
+            if len(drawer) == 1:
+                raise OSError('Verbindung unterbrochen')
+
+    manager = PrinterManager()
+    manager._printer = FlakyPrinter()
+    monkeypatch.setattr(manager, 'reset', lambda: None)
+
+    assert manager.print_rendered(b'Beleg', cut=True, open_drawer=True)['success'] is True
+    assert drawer == [True, False]
@@ -0,0 +1,45 @@
+import json
+import time
+
+from events import broker
+
+
+def received(subscriber, event):
+    messages = []
+    while not subscriber.empty():
+        message = subscriber.get_nowait()
+        if f'event: {event}\n' in message:
+            data = message.split('data: ', 1)[1]
+            messages.append(json.loads(data))
+    return messages
+
+
+def test_printer_status_change_is_published(printer_app):
+    monitor = printer_app.printer_monitor
+    monitor.refresh()
+    subscriber = broker.subscribe()
+    try:
+        # Unveränderter Status: kein Ereignis
+        monitor.refresh()
+        assert received(subscriber, 'printer-status') == []
+
+        # Ein Druckjob ändert den Status des virtuellen Druckers
+        printer_app.printer_manager.run(lambda printer: printer.write_job(b'test', 'Test'))
+        monitor.refresh()
+        events = received(subscriber, 'printer-status')
+        assert len(events) == 1
+        assert events[0]['status']['online'] is True
+        assert events[0]['status']['printed_jobs'] >= 1
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def test_snapshot_refreshes_without_monitor_thread():
+    from printer_support import PrinterMonitor, printer_manager
+
+    monitor = PrinterMonitor(printer_manager, interval=0.05)
+    first = monitor.snapshot()
+    time.sleep(0.1)
+    second = monitor.snapshot()
+    assert second['checked_at'] >= first['checked_at']
+    assert second['age_seconds'] < 0.05
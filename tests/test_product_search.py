@@ -0,0 +1,27 @@
+import json
+
+
+def import_products(client, products):
+    body = '\n'.join(json.dumps(product) for product in products)
+    response = client.post('/api/products/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    messages = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert messages[-1]['type'] != 'failed', messages[-1]
+
+
+def test_best_match_with_high_rowid_is_ranked_first(client):
+    # Mehr Treffer über die Kategorie als bewertet werden dürfen, der
+    # Namenstreffer kommt zuletzt und hat damit die höchste rowid
+    import_products(client, [
+        {'name': f'Bohnen Sorte {i}', 'price': 5.0, 'barcode': f'RANK{i:05d}', 'category': 'Röstkaffee'}
+        for i in range(1500)
+    ] + [
+        {'name': 'Röstkaffee Crema', 'price': 7.5, 'barcode': 'RANKCREMA', 'category': 'Röstkaffee'}
+    ])
+
+    response = client.get('/api/products/search?q=röstkaffee&limit=5')
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['name'] == 'Röstkaffee Crema'
+    assert len(results) == 5
@@ -0,0 +1,57 @@
+import sqlite3
+
+from database import upgrade_schema
+from reports import build_daily_report
+
+
+def test_upgrade_fills_rollups_from_existing_sales(tmp_path):
+    # Datenbank im Stand vor den Tageswerten
+    conn = sqlite3.connect(tmp_path / 'alt.db')
+    conn.executescript('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+            price REAL NOT NULL, category TEXT, barcode TEXT UNIQUE, stock INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE sales (id INTEGER PRIMARY KEY AUTOINCREMENT, total_amount REAL NOT NULL,
+            payment_method TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            cashier TEXT DEFAULT 'System');
+        CREATE TABLE sale_items (id INTEGER PRIMARY KEY AUTOINCREMENT, sale_id INTEGER,
+            product_id INTEGER, quantity INTEGER NOT NULL, unit_price REAL NOT NULL,
+            total_price REAL NOT NULL);
+        INSERT INTO products (name, price, category, stock) VALUES ('Brot', 2.5, 'Backwaren', 10);
+        INSERT INTO sales (total_amount, payment_method, created_at)
+            VALUES (5.0, 'Bargeld', '2024-05-05 10:00:00');
+        INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, total_price)
+            VALUES (1, 1, 2, 2.5, 5.0);
+    ''')
+
+    upgrade_schema(conn)
+    conn.commit()
+
+    report = build_daily_report(conn, '2024-05-05')
+    assert report['total_transactions'] == 1
+    assert report['total_revenue'] == 5.0
+    assert report['top_products'][0]['quantity'] == 2
+
+    # Ein zweiter Start baut die Tageswerte nicht erneut auf
+    conn.execute("DELETE FROM daily_payment_totals")
+    upgrade_schema(conn)
+    assert build_daily_report(conn, '2024-05-05')['total_transactions'] == 0
+
+
+def test_upgrade_drops_unused_report_index(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'alt.db')
+    conn.executescript('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, price REAL, category TEXT,
+            barcode TEXT, stock INTEGER, created_at TIMESTAMP);
+        CREATE TABLE sales (id INTEGER PRIMARY KEY, total_amount REAL, payment_method TEXT,
+            created_at TIMESTAMP, cashier TEXT);
+        CREATE TABLE sale_items (id INTEGER PRIMARY KEY, sale_id INTEGER, product_id INTEGER,
+            quantity INTEGER, unit_price REAL, total_price REAL);
+        CREATE INDEX idx_sales_created_payment ON sales (created_at, payment_method, total_amount);
+    ''')
+
+    upgrade_schema(conn)
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_sales_created_payment' not in indexes
+    assert 'idx_sales_created_id' in indexes
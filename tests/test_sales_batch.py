@@ -0,0 +1,48 @@
+import uuid
+
+
+def batch_sale(**changes):
+    sale = {
+        'client_id': str(uuid.uuid4()),
+        'total_amount': 1.0,
+        'payment_method': 'Bargeld',
+        'items': [{'product_id': 1, 'quantity': 2, 'unit_price': 0.5, 'total_price': 1.0}]
+    }
+    sale.update(changes)
+    return sale
+
+
+def stock(client, product_id):
+    return next(p['stock'] for p in client.get('/api/products').get_json() if p['id'] == product_id)
+
+
+def test_malformed_sale_is_rejected_individually(client):
+    before = stock(client, 1)
+    sales = [
+        batch_sale(),
+        batch_sale(items=[{'product_id': 1, 'quantity': 'zwei', 'unit_price': 0.5, 'total_price': 1.0}]),
+        batch_sale(total_amount='1,00'),
+        batch_sale(items=[{'product_id': 1, 'quantity': 0, 'unit_price': 0.5, 'total_price': 0}]),
+        batch_sale(),
+    ]
+
+    response = client.post('/api/sales/batch', json={'sales': sales})
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [
+        'created', 'rejected', 'rejected', 'rejected', 'created'
+    ]
+    assert 'quantity' in results[1]['error']
+    assert 'total_amount' in results[2]['error']
+    assert 'quantity' in results[3]['error']
+    assert stock(client, 1) == before - 4
+
+
+def test_batch_is_idempotent(client):
+    sale = batch_sale()
+    first = client.post('/api/sales/batch', json={'sales': [sale]}).get_json()['results'][0]
+    again = client.post('/api/sales/batch', json={'sales': [sale]}).get_json()['results'][0]
+
+    assert first['status'] == 'created'
+    assert again == {'client_id': sale['client_id'], 'status': 'duplicate', 'sale_id': first['sale_id']}